@@ -9,28 +9,48 @@
   @date  2021-03-31
   @url https://github.com/DFRobot/DFRobot_MultiGasSensor
 """
-import serial
 import time
-import smbus
-import spidev
 import os
 import math
-import RPi.GPIO as GPIO
-import logging
+import bisect
+import threading
+import select
+from collections import namedtuple
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)  #Display all the print information
-#logger.setLevel(logging.FATAL)#Use this option if you don't want to display too many prints but only printing errors
-ph = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s - [%(filename)s %(funcName)s]:%(lineno)d - %(levelname)s: %(message)s")
-ph.setFormatter(formatter) 
-logger.addHandler(ph)
+# smbus (or smbus2) and serial are imported when a sensor using them is created, the library does not configure logging.
 
 I2C_MODE  = 0x01
 UART_MODE = 0x02
 
-sendbuf = [0]*9  
-recvbuf = [0]*9
+## Serial port of the UART sensors when none is given, the UART of the Raspberry Pi header.
+UART_PORT = "/dev/ttyAMA0"
+
+from DFRobot_MultiGasSensor_codec import (
+  CMD_CHANGE_GET_METHOD, CMD_GET_GAS_CONCENTRATION, CMD_GET_TEMP, CMD_GET_ALL_DTTA,
+  CMD_SET_THRESHOLD_ALARMS, CMD_IIC_AVAILABLE, CMD_SENSOR_VOLTAGE, CMD_CHANGE_IIC_ADDR,
+  REQUEST_GET_GAS_CONCENTRATION, REQUEST_GET_TEMP, REQUEST_GET_ALL_DTTA, REQUEST_SENSOR_VOLTAGE,
+  is_valid, encode_change_get_method, encode_set_threshold_alarms, encode_change_iic_addr,
+  decode_change_get_method, decode_gas_concentration, decode_temp, decode_all_data,
+  decode_set_threshold_alarms, decode_sensor_voltage, decode_change_iic_addr)
+from DFRobot_MultiGasSensor_metrics import DFRobot_Transaction, DFRobot_Metrics, bus_metrics
+
+_bus_locks = {}
+_bus_locks_guard = threading.Lock()
+
+def bus_lock(key):
+  '''!
+    @brief Get the lock serialising the transactions on one bus
+    @n     Sensors on different buses can be used from different threads at the same time,
+    @n     transactions of the sensors sharing a bus are done one after another.
+    @param key Bus identifier, ("i2c", bus number) or ("uart", serial port)
+    @return threading.RLock shared by every sensor on the bus
+  '''
+  with _bus_locks_guard:
+    lock = _bus_locks.get(key)
+    if lock is None:
+      lock = _bus_locks[key] = threading.RLock()
+    return lock
+
 def fuc_check_sum(i,ln):
   '''!
     @brief CRC check function
@@ -38,11 +58,41 @@ def fuc_check_sum(i,ln):
     @param ln Length
     @return CRC check value
   '''
-  tempq=0
-  for j in range(1,ln-1):
-    tempq+=i[j]
-  tempq=(((~tempq)&0xff)+1)
-  return tempq
+  return -sum(i[1:ln-1]) & 0xff
+
+def is_valid_response(recv,cmd):
+  '''!
+    @brief Check that a received frame is a complete response to the given command
+    @param recv Received data list
+    @param cmd  Command byte the response is expected to echo
+    @return True if the frame head, command echo and CRC check value all match
+  '''
+  return is_valid(recv,cmd)
+
+def adc_to_temp_reference(temp_ADC):
+  '''!
+    @brief Converts a temperature ADC measurement to temperature with the thermistor equation.
+    @n     Reference implementation of the lookup table used by adc_to_temp().
+    @param temp_ADC 10-bit A/D measurement from onboard temperature sensor, 1 to 1023.
+    @return Temperature, unit °C
+  '''
+  Vpd3=float(temp_ADC/1024.0)*3
+  Rth = Vpd3*10000/(3-Vpd3)
+  return 1/(1/(273.15+25)+1/3380.13*(math.log(Rth/10000)))-273.15
+
+# ADC 0 means a shorted thermistor, the equation has no value for it.
+TEMP_TABLE = tuple([float("nan")] + [adc_to_temp_reference(adc) for adc in range(1, 1024)])
+
+def adc_to_temp(temp_ADC):
+  '''!
+    @brief Converts a temperature ADC measurement to temperature with a lookup table.
+    @param temp_ADC 10-bit A/D measurement from onboard temperature sensor.
+    @return Temperature, unit °C. NaN for readings the thermistor equation is not defined for
+    @n      (0, and 1024 or more, which a 10-bit ADC cannot return).
+  '''
+  if 0 <= temp_ADC < 1024:
+    return TEMP_TABLE[temp_ADC]
+  return float("nan")
 
 def clear_buffer(buf,length):
   '''!
@@ -74,6 +124,302 @@ class DFRobot_GasType:
   UNKNOWN = ""
 
 
+## Gas type byte reported by the probe -> DFRobot_GasType
+GAS_TYPE_CODES = {
+  0x05: DFRobot_GasType.O2,
+  0x04: DFRobot_GasType.CO,
+  0x03: DFRobot_GasType.H2S,
+  0x2C: DFRobot_GasType.NO2,
+  0x2A: DFRobot_GasType.O3,
+  0x31: DFRobot_GasType.CL2,
+  0x02: DFRobot_GasType.NH3,
+  0x06: DFRobot_GasType.H2,
+  0x2E: DFRobot_GasType.HCL,
+  0x2B: DFRobot_GasType.SO2,
+  0x33: DFRobot_GasType.HF,
+  0x45: DFRobot_GasType.PH3,
+}
+
+## Piecewise temperature compensation of every gas: gastype -> (edges, segments[, open_top]).
+## For edges[i] < temp <= edges[i+1] the corrected value is
+##   Con / (a * temp + b) - (c * temp + d)   with (a, b, c, d) = segments[i],
+## outside of the edges it is 0.0. open_top True excludes the top edge itself (temp < edges[-1]).
+## None means the gas has no temperature dependency.
+## The thresholds and corrections replicate the C++ version of the library as of commit 54e465b.
+TEMP_COMPENSATION = {
+  DFRobot_GasType.O2:  None,
+  DFRobot_GasType.CO:  ((-40, 20, 40),    ((0.005, 0.9, 0, 0), (0.005, 0.9, 0.3, -6))),
+  DFRobot_GasType.H2S: ((-20, 20, 60),    ((0.005, 0.92, 0, 0), (0.015, -0.3, 0, 0))),
+  DFRobot_GasType.NO2: ((-20, 0, 20, 40), ((0.005, 0.9, -0.0025, 0.005), (0.005, 0.9, 0.005, 0.005), (0.005, 0.9, 0.0025, 0.1))),
+  DFRobot_GasType.O3:  ((-20, 0, 20, 40), ((0.015, 1.1, 0, 0.05), (0, 1.1, 0.01, 0), (0, 1.1, -0.005, 0.3))),
+  DFRobot_GasType.CL2: ((-20, 0, 20, 40), ((0.015, 1.1, 0, 0.0025), (0, 1.1, 0.005, 0), (0, 1.1, -0.005, 0.3))),
+  DFRobot_GasType.NH3: ((-20, 0, 20, 40), ((0.006, 0.95, -0.006, 0.25), (0.006, 0.95, -0.012, 0.25), (0.005, 1.08, -0.1, 2))),
+  DFRobot_GasType.H2:  ((-20, 20, 40, 60),((0.0074, 0.7, 0, 5), (0.025, 0.3, 0, 5), (0.001, 0.9, 0.75, -25))),
+  DFRobot_GasType.HCL: ((-20, 0, 20, 50), ((0, 1, -0.0075, -0.1), (0, 1, 0, -0.1), (0, 1, -0.01, 0.1)), True),
+  DFRobot_GasType.SO2: ((-40, 40, 60),    ((0.006, 0.95, 0, 0), (0.006, 0.95, 0.05, -2))),
+  DFRobot_GasType.HF:  ((-20, 0, 20, 40), ((0, 1, -0.0025, 0), (0, 1, 0, -0.1), (0, 1, 0.0375, -0.85))),
+  DFRobot_GasType.PH3: ((-20, 40),        ((0.005, 0.9, 0, 0),)),
+}
+
+## Profile of the gas types missing from TEMP_COMPENSATION: every temperature is out of range.
+NO_COMPENSATION = ((), ())
+
+def temp_compensation(gastype, temp, Con):
+  '''!
+    @brief Performs temperature correction of a sensor value with TEMP_COMPENSATION.
+    @param gastype DFRobot_GasType of the probe
+    @param temp    Board temperature, unit °C
+    @param Con     Measured value from sensor
+    @return Corrected value, 0.0 for unknown gases and temperatures outside the compensated range
+  '''
+  return compensate(TEMP_COMPENSATION.get(gastype, NO_COMPENSATION), temp, Con)
+
+def compensate(profile, temp, Con):
+  '''!
+    @brief Performs temperature correction of a sensor value with one TEMP_COMPENSATION profile.
+    @param profile (edges, segments[, open_top]), or None for a gas without temperature dependency
+    @param temp    Board temperature, unit °C
+    @param Con     Measured value from sensor
+    @return Corrected value, 0.0 for temperatures outside the compensated range
+  '''
+  if profile is None:
+    return Con
+  edges, segments = profile[:2]
+  if len(profile) > 2 and profile[2] and temp >= edges[-1]:
+    return 0.0
+  i = bisect.bisect_left(edges, temp)
+  if i == 0 or i == len(edges):
+    return 0.0
+  a, b, c, d = segments[i-1]
+  return Con / (a * temp + b) - (c * temp + d)
+
+def temp_compensation_batch(concentrations, temps, gastypes):
+  '''!
+    @brief Vectorised temp_compensation() over NumPy arrays, for reprocessing recorded data.
+    @n     Requires NumPy. Compensation is applied regardless of set_temp_compensation().
+    @param concentrations Raw concentrations, already scaled by their resolution
+    @param temps          Board temperatures, unit °C
+    @param gastypes       DFRobot_GasType strings, or gas type bytes reported by the probes
+    @return numpy.ndarray of float64 corrected values
+  '''
+  import numpy as np
+  con = np.asarray(concentrations, dtype=np.float64)
+  temps = np.asarray(temps, dtype=np.float64)
+  gastypes = np.asarray(gastypes)
+  con, temps, gastypes = np.broadcast_arrays(con, temps, gastypes)
+  out = np.zeros(con.shape)
+  if gastypes.dtype.kind in "iu":
+    keys = [(code, GAS_TYPE_CODES[code]) for code in GAS_TYPE_CODES]
+  else:
+    keys = [(gastype, gastype) for gastype in TEMP_COMPENSATION]
+  for key, gastype in keys:
+    mask = gastypes == key
+    if not mask.any():
+      continue
+    profile = TEMP_COMPENSATION[gastype]
+    if profile is None:
+      out[mask] = con[mask]
+      continue
+    edges, segments = profile[:2]
+    t = temps[mask]
+    i = np.searchsorted(edges, t, side="left")
+    valid = (i > 0) & (i < len(edges))
+    if len(profile) > 2 and profile[2]:
+      valid &= t < edges[-1]
+    a, b, c, d = np.asarray(segments, dtype=np.float64)[np.clip(i - 1, 0, len(segments) - 1)].T
+    with np.errstate(divide="ignore", invalid="ignore"):
+      out[mask] = np.where(valid, con[mask] / (a * t + b) - (c * t + d), 0.0)
+  return out
+
+
+## Gas types whose alarm threshold is sent to the sensor in tenths.
+_THRESHOLD_TENTHS = (DFRobot_GasType.O2, DFRobot_GasType.NO2, DFRobot_GasType.O3, DFRobot_GasType.CL2,
+                     DFRobot_GasType.HCL, DFRobot_GasType.SO2, DFRobot_GasType.HF, DFRobot_GasType.PH3)
+
+## Everything the library derives from the type and resolution bytes of a probe.
+DFRobot_GasDescriptor = namedtuple("DFRobot_GasDescriptor",
+                                   ["code", "gastype", "units", "decimals", "resolution", "threshold_scale", "compensation"])
+
+_descriptors = {}
+
+def gas_descriptor(code, decimals=0):
+  '''!
+    @brief Get the descriptor of a probe, built once per type and resolution
+    @param code     Gas type byte reported by the probe
+    @param decimals Decimals byte reported by the probe, 0: resolution 1, 1: 0.1, 2: 0.01
+    @return DFRobot_GasDescriptor, gastype DFRobot_GasType.UNKNOWN for unknown type bytes
+  '''
+  descriptor = _descriptors.get((code, decimals))
+  if descriptor is None:
+    gastype = GAS_TYPE_CODES.get(code, DFRobot_GasType.UNKNOWN)
+    if gastype == DFRobot_GasType.UNKNOWN:
+      units = ""
+    elif gastype == DFRobot_GasType.O2:
+      units = "%%"
+    else:
+      units = "ppm"
+    descriptor = _descriptors[(code, decimals)] = DFRobot_GasDescriptor(
+      code, gastype, units, decimals, (1, 0.1, 0.01)[decimals] if 0 <= decimals <= 2 else 1,
+      10 if gastype in _THRESHOLD_TENTHS else 1, TEMP_COMPENSATION.get(gastype, NO_COMPENSATION))
+  return descriptor
+
+
+class DFRobot_FrameDecoder(object):
+  '''!
+    @brief Incremental decoder for the 9-byte frames received over UART.
+    @n     Bytes are appended with feed() as they arrive, frames() yields every complete frame
+    @n     with a valid check value. Bytes before a 0xFF frame head are skipped, and when a
+    @n     candidate frame fails the checksum only its head byte is skipped, so a frame that
+    @n     starts inside the bad one is still found.
+  '''
+  def __init__(self):
+    self.buf = bytearray()
+    self.dropped = 0     # Bytes discarded while looking for a frame head.
+    self.bad_frames = 0  # Candidate frames that failed the checksum.
+
+  def feed(self, data):
+    '''!
+      @brief Append received bytes to the decoder
+      @param data Received bytes
+    '''
+    self.buf.extend(data)
+
+  def frames(self):
+    '''!
+      @brief Generator yielding every complete frame in the buffer
+      @n     Undecoded bytes stay buffered until more data is fed, and frames not consumed
+      @n     yet stay buffered if the caller stops iterating early.
+      @return bytearray of 9 bytes per frame
+    '''
+    buf = self.buf
+    while True:
+      start = buf.find(b'\xff')
+      if start < 0:
+        self.dropped += len(buf)
+        del buf[:]
+        return
+      if start > 0:
+        self.dropped += start
+        del buf[:start]
+      if len(buf) < 9:
+        return
+      if fuc_check_sum(buf,8) == buf[8]:
+        frame = buf[:9]
+        del buf[:9]
+        yield frame
+      else:
+        self.bad_frames += 1
+        self.dropped += 1
+        del buf[:1]
+
+
+class DFRobot_Turnaround(object):
+  '''!
+    @brief Base class of the strategies deciding how long to wait for a response.
+    @n     waits() is a generator yielding the time to wait before each read of the response,
+    @n     the caller sends back whether that read returned a valid response. This keeps the
+    @n     timing shared between blocking callers (exchange()) and other drivers such as the
+    @n     asyncio client or the fleet poller.
+  '''
+  def waits(self):
+    raise NotImplementedError
+
+  def exchange(self, sensor, send, recv):
+    '''!
+      @brief Send a command frame and read its response
+      @param sensor DFRobot_MultiGasSensor instance owning the transport
+      @param send   Command frame to send
+      @param recv   List the 9-byte response is read into
+      @return True if a valid response to the command was received
+    '''
+    transaction = sensor.transaction.begin(send[2], getattr(sensor, "decoder", None))
+    valid = False
+    try:
+      # Nothing will answer a request that was not sent, do not wait for the timeout.
+      if not transaction.write(sensor.write_data,send):
+        return False
+      waits = self.waits()
+      try:
+        delay = next(waits)
+        while True:
+          if delay > 0:
+            time.sleep(delay)
+          valid = transaction.read(sensor.read_data,recv)
+          delay = waits.send(valid)
+      except StopIteration:
+        pass
+    finally:
+      sensor.record_transaction(transaction, valid)
+    return valid
+
+
+class DFRobot_FixedTurnaround(DFRobot_Turnaround):
+  '''!
+    @brief Waits a fixed time between sending a command and reading the response.
+    @n     This is how the library originally worked, keep it as a fallback for sensors
+    @n     that misbehave when they are polled early.
+  '''
+  def __init__(self, delay=0.1):
+    self.delay = delay
+
+  def waits(self):
+    yield self.delay
+
+
+class DFRobot_AdaptiveTurnaround(DFRobot_Turnaround):
+  '''!
+    @brief Polls for the response instead of sleeping a fixed time.
+    @n     The first read is done after the learned turnaround time of the sensor. If the frame
+    @n     is not a valid, checksummed response to the command yet, it is read again with an
+    @n     exponential backoff until timeout. Each response that arrives on the first read
+    @n     shortens the learned time a little, a response that needed more reads raises it to the
+    @n     measured time, so it settles on the shortest wait that the sensor answers within.
+  '''
+  def __init__(self, floor=0.01, initial=0.1, timeout=0.5, backoff=0.002, shrink=0.9):
+    self.floor   = floor     # Never read earlier than this, in seconds.
+    self.typical = initial   # Learned turnaround time, in seconds.
+    self.timeout = timeout
+    self.backoff = backoff
+    self.shrink  = shrink
+
+  def waits(self):
+    start = time.time()
+    deadline = start + self.timeout
+    step = self.backoff
+    valid = yield max(self.typical, self.floor)
+    if valid:
+      self.typical = max(self.typical * self.shrink, self.floor)
+      return
+    while not valid:
+      now = time.time()
+      if now >= deadline:
+        return
+      valid = yield min(step, deadline - now)
+      step *= 2
+    self.typical = time.time() - start
+
+
+class DFRobot_GasReading(object):
+  '''!
+    @brief One complete sample, as returned by DFRobot_MultiGasSensor.read_all().
+    @n     All fields come from the same CMD_GET_ALL_DTTA (0x88) response frame.
+  '''
+  def __init__(self, concentration, gasconcentration, gastype, gasunits, temp, probe_type, decimals, temp_adc):
+    self.concentration    = concentration     # Temperature compensated if compensation is on, raw otherwise.
+    self.gasconcentration = gasconcentration  # Raw, uncorrected sensor measurement.
+    self.gastype          = gastype
+    self.gasunits         = gasunits
+    self.temp             = temp
+    self.probe_type       = probe_type        # Gas type byte reported by the probe.
+    self.decimals         = decimals          # 0: resolution 1, 1: resolution 0.1, 2: resolution 0.01
+    self.temp_adc         = temp_adc
+    self.timestamp        = time.time()
+
+  def __repr__(self):
+    return "DFRobot_GasReading(gastype=%s, concentration=%s%s, temp=%s)" % (
+      self.gastype, self.concentration, self.gasunits, self.temp)
+
+
 class DFRobot_MultiGasSensor(object):
   '''!
     @brief This is a sensor parent class which can be used in complex environments to detect various gases.
@@ -81,6 +427,8 @@ class DFRobot_MultiGasSensor(object):
     @n       SO2, HF, PH3, which is achieved by just switching corresponding probes.
     @n       Meanwihle, it supports gas high/low threshold alarm.
     @n       Function
+    @n       Each instance owns its frame buffers and takes the lock of its bus for every transaction,
+    @n       so sensors can be read from several threads.
   '''  
   INITIATIVE =  0x03
   PASSIVITY  =  0x04
@@ -105,76 +453,170 @@ class DFRobot_MultiGasSensor(object):
   gasunits      =    ""
   temp          =    0.0
   tempSwitch = OFF
+  recorder      =    None
+  history       =    None
+  statistics    =    None
+  sink          =    None
+  sink_name     =    ""
+  latest        =    None   # DFRobot_GasReading of the last CMD_GET_ALL_DTTA response.
+  descriptor    =    None   # DFRobot_GasDescriptor of the probe, set by the first response.
+  record_address =   0
   
-  def __init__(self ,bus ,Baud):
+  def __init__(self ,bus ,Baud ,transport=None ,port=UART_PORT):
+    '''!
+      @param bus       I2C bus number, 0 for UART
+      @param Baud      UART baud rate
+      @param transport Object used instead of smbus.SMBus(bus) or serial.Serial(port),
+      @n               for example a DFRobot_SimulatedI2CBus or DFRobot_SimulatedSerial. I2C transports
+      @n               implement write_i2c_block_data() and read_i2c_block_data(), UART transports
+      @n               implement write(), inWaiting() and read() as in pyserial.
+      @param port      Serial port of a UART sensor, for example "/dev/ttyUSB0" for a USB adapter
+    '''
+    self.recvbuf = bytearray(9)
     if bus != 0:
-      self.i2cbus = smbus.SMBus(bus)
+      key = ("i2c", bus if transport is None else transport)
+    else:
+      key = ("uart", port if transport is None else transport)
+    self.bus_lock = bus_lock(key)
+    self.bus_metrics = bus_metrics(key)
+    self.metrics = DFRobot_Metrics({"bus": self.bus_metrics.labels["bus"]})
+    self.transaction = DFRobot_Transaction()
+    if bus != 0:
+      if transport is None:
+        from DFRobot_MultiGasSensor_i2c import open_i2c_bus
+        self.i2cbus = open_i2c_bus(bus)
+      else:
+        self.i2cbus = transport
       self.__uart_i2c = I2C_MODE
     else:
-      self.ser = serial.Serial("/dev/ttyAMA0" ,baudrate=Baud,stopbits=1)
+      if transport is None:
+        import serial
+        self.ser = serial.Serial(port ,baudrate=Baud,stopbits=1)
+      else:
+        self.ser = transport
       self.__uart_i2c = UART_MODE
       if self.ser.isOpen == False:
         self.ser.open()
         
+  def set_turnaround(self, turnaround):
+    '''!
+      @brief Set how the library waits for the response after sending a command
+      @param turnaround Turnaround strategy
+      @n     DFRobot_AdaptiveTurnaround() Poll for a valid response and learn the sensor's response time (default)
+      @n     DFRobot_FixedTurnaround(0.1) Always wait a fixed time, as older versions of the library did
+    '''
+    self.turnaround = turnaround
+
+  def set_recorder(self, recorder, address=None):
+    '''!
+      @brief Record every raw frame read from the sensor
+      @param recorder DFRobot_FrameRecorder the frames are appended to, None to stop recording
+      @param address  Sensor address stored with the frames, None keeps the default
+      @n              ((bus << 8) | I2C address for I2C sensors, 0 for UART sensors)
+    '''
+    self.recorder = recorder
+    if address is not None:
+      self.record_address = address
+
+  def record_frame(self, frame):
+    '''!
+      @brief Pass a frame read from the sensor to the recorder, if one is set
+      @param frame Raw 9-byte frame
+    '''
+    if self.recorder is not None:
+      self.recorder.record(self.record_address, frame)
+
+  def set_history(self, history):
+    '''!
+      @brief Append every CMD_GET_ALL_DTTA (0x88) reading to a compact columnar history
+      @param history DFRobot_ReadingHistory, None to stop appending
+    '''
+    self.history = history
+
+  def set_statistics(self, statistics):
+    '''!
+      @brief Add every CMD_GET_ALL_DTTA (0x88) reading to rolling statistics (mean, min, max, EWMA, TWA)
+      @param statistics DFRobot_ReadingStatistics, None to stop adding
+    '''
+    self.statistics = statistics
+
+  def set_sink(self, sink, name=None):
+    '''!
+      @brief Store every CMD_GET_ALL_DTTA (0x88) reading with a batched sink, queued without waiting for the disk
+      @param sink DFRobot_SQLiteSink, DFRobot_CSVSink or DFRobot_ColumnarSink, None to stop storing
+      @param name Sensor name stored with the readings, None for "<bus>/<address>" such as "i2c-1/0x74"
+    '''
+    self.sink = sink
+    if name is None:
+      labels = self.metrics.labels
+      name = labels["bus"] + ("/" + labels["address"] if "address" in labels else "")
+    self.sink_name = name
+
+  def stream(self, size=256, policy="drop_oldest", interval=1.0):
+    '''!
+      @brief Iterate over the readings pushed by the sensor in INITIATIVE mode, captured by a
+      @n     background DFRobot_ReadingStream. The reader stops when the generator is closed.
+      @param size     Number of readings buffered for a slow consumer
+      @param policy   "drop_oldest" to discard the oldest readings when the buffer is full, "block"
+      @n              to stop reading until there is room
+      @param interval Seconds between two requests on I2C, which has no push
+      @return Generator of DFRobot_GasReading objects
+    '''
+    from DFRobot_MultiGasSensor_stream import DFRobot_ReadingStream
+    reader = DFRobot_ReadingStream(self, size, policy, interval=interval).start()
+    try:
+      for reading in reader:
+        yield reading
+    finally:
+      reader.stop()
+
+  def record_transaction(self, transaction, valid):
+    '''!
+      @brief Add a finished transaction to the metrics of the sensor and of its bus
+      @param transaction DFRobot_Transaction
+      @param valid       Whether a valid response was received
+    '''
+    transaction.finish()
+    self.metrics.record(transaction, valid)
+    self.bus_metrics.record(transaction, valid)
+
+  def stats(self):
+    '''!
+      @brief Transaction metrics of the sensor: counters, transfer and waiting time and latency
+      @n     histogram per command byte, see DFRobot_Metrics.stats(). The bus metrics are in
+      @n     bus_stats() of DFRobot_MultiGasSensor_metrics.
+      @return dict
+    '''
+    return self.metrics.stats()
+
   def __getitem__(self, k):
-    if k == recvbuf:
-      return recvbuf
+    if k == self.recvbuf:
+      return self.recvbuf
 
 
-  def __set_gastype(self, probe_type):
+  def __set_gastype(self, probe_type, decimals=0):
     '''!
-      @brief   Sets instance gas type and units based on type read from sensor.
+      @brief   Sets the descriptor, gas type and units based on the type and decimals read from sensor.
+      @n       The descriptor is only looked up again when the probe reports other bytes, for example
+      @n       after it was swapped. Only call it with frames that passed is_valid(), the type byte 0
+      @n       of an empty frame would replace the probe type for every later reading.
       @param probe_type Byte received from sensor indicating sensor type.
+      @param decimals   Byte received from sensor indicating the resolution.
+      @return DFRobot_GasDescriptor
     '''
-    if probe_type == self.O2:
-      self.gastype = DFRobot_GasType.O2
-      self.gasunits = "%%"
-    elif probe_type == self.CO:
-      self.gastype = DFRobot_GasType.CO
-      self.gasunits = "ppm"
-    elif probe_type == self.H2S:
-      self.gastype = DFRobot_GasType.H2S
-      self.gasunits = "ppm"
-    elif probe_type == self.NO2:
-      self.gasunits = "ppm"
-      self.gastype = DFRobot_GasType.NO2
-    elif probe_type == self.O3:
-      self.gasunits = "ppm"
-      self.gastype = DFRobot_GasType.O3
-    elif probe_type == self.CL2:
-      self.gasunits = "ppm"
-      self.gastype = DFRobot_GasType.CL2
-    elif probe_type == self.NH3:
-      self.gasunits = "ppm"
-      self.gastype = DFRobot_GasType.NH3
-    elif probe_type == self.H2:
-      self.gastype = DFRobot_GasType.H2
-      self.gasunits = "ppm"
-    elif probe_type == self.HCL:
-      self.gastype = DFRobot_GasType.HCL
-      self.gasunits = "ppm"
-    elif probe_type == self.SO2:
-      self.gastype = DFRobot_GasType.SO2
-      self.gasunits = "ppm"
-    elif probe_type == self.HF:
-      self.gastype = DFRobot_GasType.HF
-      self.gasunits = "ppm"
-    elif probe_type == self.PH3:
-      self.gastype = DFRobot_GasType.PH3
-      self.gasunits = "ppm"
-    else:
-      self.gastype =DFRobot_GasType.UNKNOWN
-      self.gasunits = ""
-
+    descriptor = self.descriptor
+    if descriptor is None or descriptor.code != probe_type or descriptor.decimals != decimals:
+      descriptor = self.descriptor = gas_descriptor(probe_type, decimals)
+      self.gastype = descriptor.gastype
+      self.gasunits = descriptor.units
+    return descriptor
 
   def __adc_to_temp(self, temp_ADC):
     '''!
       @brief Converts temperature ADC measurement to temperature.
       @param temp_ADC 10-bit A/D measurement from onboard temperature sensor.
     '''
-    Vpd3=float(temp_ADC/1024.0)*3
-    Rth = Vpd3*10000/(3-Vpd3)
-    return 1/(1/(273.15+25)+1/3380.13*(math.log(Rth/10000)))-273.15
+    return adc_to_temp(temp_ADC)
 
 
   def __temp_correction(self, Con):
@@ -182,165 +624,87 @@ class DFRobot_MultiGasSensor(object):
       @brief Performs temperature correction of sensor value.
       @param Con Measured value from sensor.
     '''
-
-    # NOTE: this implementation replicates the thresholds and corrections
-    # from the C++ version of the library as of commit 54e465b. The python
-    # version was significantly different in many ways, resulting in different
-    # results based on which library is used.
-
-    # TODO: restructure all of the checks below to stop repeatedly checking
-    # against the same tresholds over and over. This would be more efficient
-    # and way more readable if all of the checks followed the pattern:
-    #
-    # if self.temp < threshold_1:
-    #   Con = 0.0
-    # elif self.temp < threshold_2:
-    #   Con = some sort of correction
-    # elif self.temp < theshold_3:
-    #   Con = another correction
-    # else:
-    #   Con = 0.0
-    
     # If temperature corrections not enabled, don't alter the sensor value.
     if self.tempSwitch != self.ON:
+      return Con
+    if self.descriptor is None:
       return 0.0
-
-    if self.gastype == DFRobot_GasType.O2:
-      # No temperature dependency.
-      pass
-
-    elif self.gastype == DFRobot_GasType.CO:
-      if (self.temp > -40) and (self.temp <= 20):
-        Con = Con / (0.005 * self.temp + 0.9)
-      elif (self.temp > 20) and (self.temp <= 40):
-        Con = Con / (0.005 * self.temp + 0.9) - (0.3 *self.temp - 6)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.H2S:
-      if (self.temp > -20) and (self.temp <= 20):
-        Con = Con / (0.005 * self.temp + 0.92)
-      elif (self.temp > 20) and (self.temp <= 60):
-        Con = Con / (0.015 * self.temp - 0.3);
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.NO2:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con / (0.005 * self.temp + 0.9) - (-0.0025 * self.temp + 0.005)
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con / (0.005 * self.temp + 0.9) - (0.005 * self.temp + 0.005)
-      elif (self.temp > 20) and (self.temp <= 40):
-        Con = Con / (0.005 * self.temp + 0.9) - (0.0025 * self.temp + 0.1)
-      else :
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.O3:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con / (0.015 * self.temp + 1.1) - 0.05
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con/1.1 - (0.01 * self.temp)
-      elif (self.temp > 20) and (self.temp <= 40):
-        Con = Con/1.1 - (-0.005 * self.temp + 0.3)
-      else:
-         Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.CL2:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con / (0.015 * self.temp + 1.1) -0.0025
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con / 1.1 - 0.005 * self.temp
-      elif (self.temp > 20) and (self.temp < 40):
-        Con = Con/1.1 - (-0.005 * self.temp + 0.3)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.NH3:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con / (0.006 * self.temp + 0.95) - (-0.006 * self.temp + 0.25)
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con / (0.006 * self.temp + 0.95) - (-0.012 * self.temp + 0.25)
-      elif (self.temp > 20) and (self.temp < 40):
-        Con = Con / (0.005 * self.temp + 1.08) - (-0.1 * self.temp + 2)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.H2:
-      if (self.temp > -20) and (self.temp <= 20):
-        Con = Con / (0.0074 * self.temp + 0.7) - 5
-      if (self.temp > 20) and (self.temp <= 40):
-        Con = Con / (0.025 * self.temp + 0.3) - 5
-      if (self.temp > 40) and (self.temp <= 60):
-        Con = Con / (0.001 * self.temp + 0.9) - (0.75 * self.temp-25)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.HCL:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con - (-0.0075 * self.temp - 0.1)
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con - (-0.1)
-      elif (self.temp > 20) and (self.temp < 50):
-        Con = Con - (-0.01 * self.temp + 0.1)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.SO2:
-      if (self.temp >- 40) and (self.temp <= 40):
-        Con = Con / (0.006 * self.temp + 0.95)
-      elif (self.temp > 40) and (self.temp <= 60):
-        Con = Con / (0.006 * self.temp + 0.95) - (0.05 * self.temp - 2)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.HF:
-      if (self.temp > -20) and (self.temp <= 0):
-        Con = Con / 1 - (-0.0025 * self.temp)
-      elif (self.temp > 0) and (self.temp <= 20):
-        Con = Con / 1 + 0.1
-      elif (self.temp>20) and (self.temp < 40):
-        Con = Con / 1 - (0.0375 * self.temp - 0.85)
-      else:
-        Con = 0.0
-
-    elif self.gastype == DFRobot_GasType.PH3:
-      if (self.temp > -20) and (self.temp < 40):
-        Con = Con / (0.005 * self.temp + 0.9)
-      else:
-        Con = 0.0
-
-    else: # Do not modify values for unknown sensors.
-      Con = 0.0
-      pass
-    # No sensor measurements are ever below zero, so it makes little sense
-    # for the corrected version to be so.
-    return Con
+    return compensate(self.descriptor.compensation, self.temp, Con)
 
 
   def analysis_all_data(self,recv):
     '''!
       @brief   The obtained data list by parsing.
       @param recv The obtained data
+      @return Concentration, NaN without any change if recv is not a valid CMD_GET_ALL_DTTA response
     '''    
-    #recv[5]Indicate resolution, 0 indicate resolution is 1, 1 indicate resolution is 0.1, 2 indicate resolution is 0.01
-    if(recv[5]==0):
-      self.gasconcentration = (recv[2] << 8) + recv[3]
-    elif(recv[5]==1):
-      self.gasconcentration = 0.1*((recv[2] << 8) + recv[3])
-    elif(recv[5]==2):
-      self.gasconcentration = 0.01*((recv[2] << 8) + recv[3])
+    if not is_valid(recv,CMD_GET_ALL_DTTA):
+      return float("nan")
+    return self.__analysis_all_data(recv)
 
-    # Update sensor type from info in response (byte 4).
-    self.__set_gastype(recv[4])
+  def __analysis_all_data(self,recv):
+    # analysis_all_data() of a frame already checked.
+    data = decode_all_data(recv)
+    # Update sensor type and resolution from info in response (bytes 4 and 5).
+    descriptor = self.__set_gastype(data.gastype, data.decimals)
+    self.gasconcentration = data.raw*descriptor.resolution
 
     # Update current temperature.
-    temp_ADC=(recv[6]<<8)+recv[7]
-    self.temp = self.__adc_to_temp(temp_ADC)
+    self.temp = self.__adc_to_temp(data.temp_adc)
 
     # Perform temperature correction of the value if enabled.
     Con = self.__temp_correction(self.gasconcentration)
+    return Con
+
+  def read_all(self):
+    '''!
+      @brief Get gas concentration, probe type, resolution and board temperature with a single
+      @n     CMD_GET_ALL_DTTA (0x88) request, instead of read_gas_concentration() plus read_temp().
+      @n     Use it in PASSIVITY mode.
+      @return DFRobot_GasReading object, or None if no valid response was received
+    '''
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      # An all-zero buffer passes the checksum, check the frame head and command byte too.
+      if not self.turnaround.exchange(self,REQUEST_GET_ALL_DTTA,self.recvbuf):
+        return None
+      return self.analysis_reading(self.recvbuf)
+
+  def fresh_reading(self, max_age):
+    '''!
+      @brief The latest reading, if it is recent enough
+      @param max_age Largest age in seconds, None to never use the latest reading
+      @return DFRobot_GasReading, or None if there is none or it is older than max_age
+    '''
+    reading = self.latest
+    if max_age is None or reading is None or time.time() - reading.timestamp > max_age:
+      return None
+    return reading
+
+  def analysis_reading(self,recv,timestamp=None):
+    '''!
+      @brief Parse a CMD_GET_ALL_DTTA (0x88) response, as analysis_all_data() does
+      @param recv      The obtained data
+      @param timestamp Time of the reading, None for now
+      @return DFRobot_GasReading object, None if recv is not a valid CMD_GET_ALL_DTTA response
+    '''
+    if not is_valid(recv,CMD_GET_ALL_DTTA):
+      return None
+    Con = self.__analysis_all_data(recv)
+    data = decode_all_data(recv)
+    reading = DFRobot_GasReading(Con, self.gasconcentration, self.gastype, self.gasunits, self.temp,
+                                 data.gastype, data.decimals, data.temp_adc)
+    if timestamp is not None:
+      reading.timestamp = timestamp
+    if self.history is not None:
+      self.history.append(reading.timestamp, data.raw, data.decimals, data.temp_adc, data.gastype)
+    if self.statistics is not None:
+      self.statistics.add(reading)
+    if self.sink is not None:
+      self.sink.put(reading, self.sink_name)
+    self.latest = reading
+    return reading
 
-    
   def change_acquire_mode(self,mode):
     '''!
       @brief Change the mode of reporting data to the main controller after the sensor has collected the gas.
@@ -351,74 +715,67 @@ class DFRobot_MultiGasSensor(object):
       @retval True   change success
       @retval False  change fail
     '''
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x78
-    sendbuf[3]=mode
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-    if(recvbuf[2]==1):
-      return True
-    else:
-      return False
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,encode_change_get_method(mode),self.recvbuf):
+        return False
+      return decode_change_get_method(self.recvbuf)
 
-  def read_gas_concentration(self):
+  def read_gas_concentration(self, max_age=None):
     '''!
       @brief Get the gas concentration or type obtained by the sensor
+      @param max_age Seconds, return the concentration of the latest read_all() reading instead of
+      @n             asking the sensor if it is not older than that, see DFRobot_Sampler
       @return if data is transmitted normally, return gas concentration; otherwise, return 0xffff
     '''  
-    global sendbuf
-    global recvbuf    
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x86
-    sendbuf[3]=0x00
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-    if(fuc_check_sum(recvbuf,8) == recvbuf[8]):
-      self.gasconcentration = ((recvbuf[2]<<8)+recvbuf[3])*1.0
-
-      # Scale measurement based on the number of decimal places indicated
-      # by the sensor.
-      decimal_digits = recvbuf[5]
-      if decimal_digits == 1:
-        self.gasconcentration = self.gasconcentration * 0.1
-      elif decimal_digits == 2:
-        self.gasconcentration = self.gasconcentration * 0.01
-
-    else: # Checksum failed.
-      return 0.0
+    reading = self.fresh_reading(max_age)
+    if reading is not None:
+      return reading.concentration
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,REQUEST_GET_GAS_CONCENTRATION,self.recvbuf):
+        return 0.0
+      if not self.analysis_gas_concentration(self.recvbuf):
+        return 0.0
 
-    # Update sensor type from info in response (byte 4).
-    self.__set_gastype(recvbuf[4])
+      # Update temperature measurement if temperature correction is enabled, keep the last one if it fails.
+      if(self.tempSwitch == self.ON):
+        temp = self.read_temp()
+        if temp == temp:
+          self.temp = temp
 
-    # Update temperature measurement if temperature correction is enabled.
-    if(self.tempSwitch == self.ON):
-      self.temp = self.read_temp()
+      # Perform temperature correction of the value if enabled.
+      return self.temp_correction(self.gasconcentration)
 
-    # Perform temperature correction of the value if enabled.
-    Con = self.__temp_correction(self.gasconcentration)
+  def analysis_gas_concentration(self,recv):
+    '''!
+      @brief Parse a CMD_GET_GAS_CONCENTRATION (0x86) response into gasconcentration and gastype
+      @param recv The obtained data
+      @return False if the frame is not a valid CMD_GET_GAS_CONCENTRATION response
+    '''
+    # An all-zero frame passes the checksum, check the frame head and command byte too.
+    if not is_valid(recv,CMD_GET_GAS_CONCENTRATION):
+      return False
+    data = decode_gas_concentration(recv)
+    # Update sensor type and resolution from info in response (bytes 4 and 5).
+    descriptor = self.__set_gastype(data.gastype, data.decimals)
+    self.gasconcentration = data.raw*1.0*descriptor.resolution
+    return True
 
-    return Con
+  def temp_correction(self,Con):
+    '''!
+      @brief Perform temperature correction of a concentration measured at the current temp
+      @param Con Measured value from sensor
+      @return Corrected value, Con unchanged if temperature compensation is off
+    '''
+    return self.__temp_correction(Con)
 
 
   def read_gas_type(self):
     '''!
-      @brief Get the gas type obtained by the sensor
-      @return Gas type
+      @brief Get the gas type obtained by the sensor, the sensor is only asked if no response
+      @n     has reported it yet
+      @return Gas type, 0xff if the sensor did not answer
       @n  O2   0x05
       @n  CO   0x04
       @n  H2S  0x03
@@ -432,24 +789,15 @@ class DFRobot_MultiGasSensor(object):
       @n  HF   0x33
       @n  PH3  0x45
     '''  
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x86
-    sendbuf[3]=0x00
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    read_reg(0,recvbuf,9)
-    if(fuc_check_sum(recvbuf,8) == recvbuf[8]):
-      return (recvbuf[4])
-    else:
-      return 0xff   
-    
+    if self.descriptor is not None:
+      return self.descriptor.code
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,REQUEST_GET_GAS_CONCENTRATION,self.recvbuf):
+        return 0xff
+      self.analysis_gas_concentration(self.recvbuf)
+      return self.descriptor.code
+
   def set_threshold_alarm(self,switchof,threshold):
     '''!
       @brief Set sensor alarm threshold
@@ -462,66 +810,50 @@ class DFRobot_MultiGasSensor(object):
       @retval True   change success
       @retval False  change fail
     '''  
-    global sendbuf
-    global recvbuf
-    if self.gastype == DFRobot_GasType.O2:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.NO2:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.O3:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.CL2:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.HCL:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.SO2:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.HF:
-      threshold *= 10
-    elif self.gastype == DFRobot_GasType.PH3:
-      threshold *= 10
-    global sendbuf
-    global recvbuf  
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x89
-    sendbuf[3]=switchof
-    sendbuf[4]=threshold>>8
-    sendbuf[5]=threshold
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-    if (recvbuf[8]!=fuc_check_sum(recvbuf,8)):
-      return False
-    if(recvbuf[2]==1):
-      return True
-    else:
-      return False   
+    with self.bus_lock:
+      threshold = self.scale_threshold(threshold)
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,encode_set_threshold_alarms(switchof,threshold),self.recvbuf):
+        return False
+      if not is_valid(self.recvbuf,CMD_SET_THRESHOLD_ALARMS):
+        return False
+      return decode_set_threshold_alarms(self.recvbuf)
 
-  def read_temp(self):
+  def scale_threshold(self,threshold):
+    '''!
+      @brief Convert an alarm threshold to the units the sensor expects for the current gastype
+      @param threshold Alarm threshold
+      @return Threshold value sent to the sensor
+    '''
+    if self.descriptor is not None:
+      threshold *= self.descriptor.threshold_scale
+    return threshold
+
+  def read_temp(self, max_age=None):
     '''!
       @brief Get sensor onboard temperature
-      @return Board temperature, unit °C
-    '''
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x87
-    sendbuf[3]=0x00
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-    temp_ADC=(recvbuf[2]<<8)+recvbuf[3]
-    return self.__adc_to_temp(temp_ADC)
+      @param max_age Seconds, return the temperature of the latest read_all() reading instead of
+      @n             asking the sensor if it is not older than that, see DFRobot_Sampler
+      @return Board temperature, unit °C, NaN if the sensor did not answer
+    '''
+    reading = self.fresh_reading(max_age)
+    if reading is not None:
+      return reading.temp
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,REQUEST_GET_TEMP,self.recvbuf):
+        return float("nan")
+      return self.analysis_temp(self.recvbuf)
+
+  def analysis_temp(self,recv):
+    '''!
+      @brief Parse a CMD_GET_TEMP (0x87) response
+      @param recv The obtained data
+      @return Board temperature, unit °C, NaN if the frame is not a valid CMD_GET_TEMP response
+    '''
+    if not is_valid(recv,CMD_GET_TEMP):
+      return float("nan")
+    return self.__adc_to_temp(decode_temp(recv))
     
   def set_temp_compensation(self,tempswitch):
     '''!
@@ -540,55 +872,44 @@ class DFRobot_MultiGasSensor(object):
       @n     The function is mainly for detecting whether the read gas concentration is right.
       @return The original voltage output of sensor gas concentration
     '''
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x91
-    sendbuf[3]=0x00
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-    if (recvbuf[8] != fuc_check_sum(recvbuf, 8)):
-      return 0.0
-    else:
-      return (((recvbuf[2] << 8) + recvbuf[3])*3.0/1024*2);
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,REQUEST_SENSOR_VOLTAGE,self.recvbuf):
+        return 0.0
+      if not is_valid(self.recvbuf,CMD_SENSOR_VOLTAGE):
+        return 0.0
+      else:
+        return decode_sensor_voltage(self.recvbuf)*3.0/1024*2
 
   def change_i2c_addr_group(self,group):
     '''!
       @brief Change I2C address group
       @param  group The group number that the sensor is supposed to be
     '''   
-    global sendbuf
-    global recvbuf
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x92
-    sendbuf[3]=group
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)      
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)  
-    if (recvbuf[8] != fuc_check_sum(recvbuf, 8)):
-      return False
-    else:
-      return recvbuf[2]    
+    with self.bus_lock:
+      clear_buffer(self.recvbuf,9)
+      if not self.turnaround.exchange(self,encode_change_iic_addr(group),self.recvbuf):
+        return False
+      if not is_valid(self.recvbuf,CMD_CHANGE_IIC_ADDR):
+        return False
+      else:
+        return decode_change_iic_addr(self.recvbuf)
       
 
 class DFRobot_MultiGasSensor_I2C(DFRobot_MultiGasSensor):
 
-  def __init__(self ,bus ,addr):
+  def __init__(self ,bus ,addr ,transport=None):
+    '''!
+      @param bus       I2C bus number
+      @param addr      I2C address of the sensor
+      @param transport Object used instead of open_i2c_bus(bus) (smbus2 or smbus), see DFRobot_MultiGasSensor
+    '''
     self.__addr = addr
-    super(DFRobot_MultiGasSensor_I2C, self).__init__(bus,0)
+    self.record_address = (bus << 8) | addr
+    super(DFRobot_MultiGasSensor_I2C, self).__init__(bus,0,transport)
+    self.metrics.labels["address"] = "0x%02X" % addr
+    # The C++ driver waits 10ms before reading a response, never poll earlier than that.
+    self.turnaround = DFRobot_AdaptiveTurnaround(floor=0.01)
 
   def data_is_available(self):
     '''
@@ -598,25 +919,7 @@ class DFRobot_MultiGasSensor_I2C(DFRobot_MultiGasSensor):
       * @retval False  error is unavailable
       *
     ''' 
-    clear_buffer(recvbuf,9)
-    sendbuf[0]=0xff
-    sendbuf[1]=0x01
-    sendbuf[2]=0x88
-    sendbuf[3]=0x00
-    sendbuf[4]=0x00
-    sendbuf[5]=0x00
-    sendbuf[6]=0x00
-    sendbuf[7]=0x00
-    sendbuf[8]=fuc_check_sum(sendbuf,8)
-    self.write_data(0,sendbuf,9)
-    time.sleep(0.1)
-    self.read_data(0,recvbuf,9)
-          
-    if (recvbuf[8] == fuc_check_sum(recvbuf, 8)):
-      self.analysis_all_data(recvbuf)
-      return True
-    else:
-      return False
+    return self.read_all() is not None
 
   def write_data(self, reg, data , length):
     '''
@@ -624,14 +927,15 @@ class DFRobot_MultiGasSensor_I2C(DFRobot_MultiGasSensor):
       @param reg register address
       @param value written data
     '''  
+    if not isinstance(data, list):
+      data = list(data)   # smbus only accepts lists, request frames are immutable bytes.
     while 1:
       try:
         self.i2cbus.write_i2c_block_data(self.__addr ,reg ,data)
         return
       except:
         print("please check connect!")
-        time.sleep(1)
-        return
+        return -1
 
   def read_data(self, reg ,data,length):
     '''
@@ -647,18 +951,33 @@ class DFRobot_MultiGasSensor_I2C(DFRobot_MultiGasSensor):
     
     for i in range(length):
       data[i] = rslt[i]  
+    # Only complete frames are recorded, as on UART, not the empty reads of a sensor still busy.
+    if is_valid(data):
+      self.record_frame(data)
     return length
     
 class DFRobot_MultiGasSensor_UART(DFRobot_MultiGasSensor):
   '''
     @brief An example of an UART interface module
   '''
-  def __init__(self ,Baud):
+  def __init__(self ,Baud ,transport=None ,read_timeout=2.0 ,port=UART_PORT):
+    '''!
+      @param Baud         UART baud rate
+      @param transport    Object used instead of serial.Serial(port), see DFRobot_MultiGasSensor
+      @param read_timeout Seconds read_data() waits for a frame when no timeout is given
+      @param port         Serial port the sensor is connected to, "/dev/ttyAMA0" by default
+    '''
     self.__Baud = Baud
+    self.read_timeout = read_timeout
+    self.decoder = DFRobot_FrameDecoder()
     try:
-      super(DFRobot_MultiGasSensor_UART, self).__init__(0,Baud)
+      super(DFRobot_MultiGasSensor_UART, self).__init__(0,Baud,transport,port)
+    except ImportError:
+      raise
     except:
       print ("plese get root!")
+    # read_data() already blocks until the response arrives, no extra wait is needed.
+    self.turnaround = DFRobot_AdaptiveTurnaround(floor=0,initial=0)
     
   def data_is_available(self):  
     '''
@@ -667,28 +986,70 @@ class DFRobot_MultiGasSensor_UART(DFRobot_MultiGasSensor):
       *@retval  True  success is Available
       *@retval  False  error is unavailable
     '''
-    if(self.read_data(0,recvbuf,9)==9):
-      if(fuc_check_sum(recvbuf,8) == recvbuf[8]):
-        self.analysis_all_data(recvbuf)
-        return True
+    with self.bus_lock:
+      if(self.read_data(0,self.recvbuf,9)==9):
+        if is_valid(self.recvbuf,CMD_GET_ALL_DTTA):
+          self.analysis_all_data(self.recvbuf)
+          return True
+        else:
+          return False
       else:
         return False
-    else:
-      return False
         
   def write_data(self, reg, data , length): 
+    '''
+      @brief Send a frame, returns once it has been transmitted
+    '''
     self.ser.write(data)
-    time.sleep(1)
-    
-  def read_data(self, reg ,data,length):
-    global recvbuf
-    timenow = time.time()
-    i = 0
-    while(time.time() - timenow) <= 2:
-      count = self.ser.inWaiting()
-      if count != 0:
-        recvbuf = self.ser.read(count)
-        self.ser.flushInput()
-        recvbuf =[ord(c) for c in recvbuf]
-        return count
+    # serial.Serial.flush() waits until the output buffer is on the wire.
+    flush = getattr(self.ser, "flush", None)
+    if flush is not None:
+      flush()
+    return length
+
+  def read_data(self, reg ,data,length,timeout=None):
+    '''
+      @brief Read the next complete frame, frames received after it are kept for the next call
+      @n     Blocks in select() or in a serial read with a timeout until bytes arrive, without polling.
+      @param data    List the frame is copied into
+      @param timeout Seconds to wait for a frame, None for read_timeout
+      @return length if a frame was read, 0 if none arrived within the timeout
+    '''
+    deadline = time.time() + (self.read_timeout if timeout is None else timeout)
+    while True:
+      for frame in self.decoder.frames():
+        for i in range(length):
+          data[i] = frame[i]
+        self.record_frame(frame)
+        return length
+      remaining = deadline - time.time()
+      if remaining <= 0:
+        return 0
+      self.decoder.feed(self.__receive(remaining))
+
+  def __receive(self, timeout):
+    '''
+      @brief Wait up to timeout seconds for received bytes
+      @return The bytes received, empty if none arrived
+    '''
+    ser = self.ser
+    count = ser.inWaiting()
+    if count:
+      return ser.read(count)
+    try:
+      fd = ser.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+      fd = None
+    if fd is not None:
+      # Sleep in the kernel until the port is readable, the port settings are left alone.
+      if not select.select([fd], [], [], timeout)[0]:
+        return b""
+      return ser.read(max(ser.inWaiting(), 1))
+    # Transports without a file descriptor: a serial read with a timeout blocks just as well.
+    previous = ser.timeout
+    ser.timeout = timeout
+    try:
+      return ser.read(1) + ser.read(ser.inWaiting())
+    finally:
+      ser.timeout = previous
   
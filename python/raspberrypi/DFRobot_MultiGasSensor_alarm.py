@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_alarm.py
+  @note Edge-triggered handling of the ALA alarm pin of the sensors
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import threading
+import time
+
+from DFRobot_MultiGasSensor_stream import DFRobot_RingBuffer, DROP_OLDEST
+
+
+class DFRobot_RPiGPIO(object):
+  '''!
+    @brief GPIO access of DFRobot_AlarmWatcher through RPi.GPIO, pins are BCM numbers.
+    @n     DFRobot_SimulatedGPIO of DFRobot_MultiGasSensor_sim has the same methods.
+  '''
+  def __init__(self):
+    import RPi.GPIO as GPIO
+    self.GPIO = GPIO
+    GPIO.setmode(GPIO.BCM)
+
+  def watch(self, pin, callback, bouncetime=0):
+    '''!
+      @brief Call callback(pin, level) on the thread of RPi.GPIO at every edge of an input pin
+      @param pin        BCM pin number
+      @param callback   Function called with the pin and its level after the edge, 0 or 1
+      @param bouncetime Milliseconds during which further edges are ignored, 0 for none
+    '''
+    GPIO = self.GPIO
+    GPIO.setup(pin, GPIO.IN)
+    def edge(channel):
+      callback(pin, GPIO.input(channel))
+    if bouncetime > 0:
+      GPIO.add_event_detect(pin, GPIO.BOTH, callback=edge, bouncetime=bouncetime)
+    else:
+      GPIO.add_event_detect(pin, GPIO.BOTH, callback=edge)
+
+  def unwatch(self, pin):
+    self.GPIO.remove_event_detect(pin)
+    self.GPIO.cleanup(pin)
+
+  def input(self, pin):
+    return self.GPIO.input(pin)
+
+
+class DFRobot_AlarmEvent(object):
+  '''!
+    @brief An edge of the alarm pin of a sensor and the reading taken because of it
+  '''
+  def __init__(self, sensor, pin, active, timestamp):
+    self.sensor    = sensor
+    self.pin       = pin
+    self.active    = active      # True when the alarm was raised, False when it cleared.
+    self.timestamp = timestamp   # time.time() of the edge.
+    self.reading   = None        # DFRobot_GasReading read after the edge, None if the read failed.
+    self.latency   = None        # Seconds from the edge to the reading.
+
+  def __repr__(self):
+    return "DFRobot_AlarmEvent(pin=%d, active=%s, reading=%r, latency=%s)" % (
+      self.pin, self.active, self.reading, self.latency)
+
+
+class DFRobot_AlarmWatcher(object):
+  '''!
+    @brief Reads a sensor as soon as its ALA pin changes level, instead of polling for alarms.
+    @details The threshold alarm set with set_threshold_alarm() drives the ALA pin of the sensor.
+    @n       The watcher registers an edge callback on the GPIO the pin is connected to and, on
+    @n       every edge, reads that sensor with read_all() on a worker thread, so the GPIO thread
+    @n       is never blocked by the bus. The reading also becomes the sensor's latest reading,
+    @n       the normal polling can therefore stay slow. The sensors must be in PASSIVITY mode.
+  '''
+  def __init__(self, callback, gpio=None, active_high=True, bouncetime=5, size=64):
+    '''!
+      @param callback    Function called with a DFRobot_AlarmEvent on the worker thread
+      @param gpio        DFRobot_RPiGPIO or DFRobot_SimulatedGPIO, None for DFRobot_RPiGPIO()
+      @param active_high True if the ALA pin is high while the alarm is raised
+      @param bouncetime  Milliseconds during which further edges of a pin are ignored
+      @param size        Number of edges queued while the worker is busy, the oldest are dropped
+    '''
+    self.callback = callback
+    self.gpio = gpio if gpio is not None else DFRobot_RPiGPIO()
+    self.active_high = active_high
+    self.bouncetime = bouncetime
+    self.sensors = {}             # pin: sensor
+    self.events = 0               # Edges handled.
+    self.errors = 0               # Exceptions raised by the transport or the callback.
+    self.__edges = DFRobot_RingBuffer(size, DROP_OLDEST)
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def watch(self, sensor, pin):
+    '''!
+      @brief Read a sensor on every edge of the pin its ALA output is connected to. If the alarm
+      @n     is already raised it is handled as an edge at once.
+      @param sensor DFRobot_MultiGasSensor_I2C or DFRobot_MultiGasSensor_UART instance
+      @param pin    GPIO pin number
+    '''
+    self.sensors[pin] = sensor
+    self.gpio.watch(pin, self.__edge, self.bouncetime)
+    if self.active(pin):
+      self.__edge(pin, self.gpio.input(pin))
+
+  def unwatch(self, pin):
+    '''!
+      @brief Stop watching a pin
+    '''
+    if self.sensors.pop(pin, None) is not None:
+      self.gpio.unwatch(pin)
+
+  def active(self, pin):
+    '''!
+      @brief Whether the alarm of a pin is raised now
+    '''
+    return bool(self.gpio.input(pin)) == self.active_high
+
+  def start(self):
+    '''!
+      @brief Start the worker thread, edges before it are handled once it runs
+      @return self
+    '''
+    if self.__thread is None:
+      self.__stop.clear()
+      self.__thread = threading.Thread(target=self.__run, name="DFRobot_AlarmWatcher")
+      self.__thread.daemon = True
+      self.__thread.start()
+    return self
+
+  def stop(self):
+    '''!
+      @brief Stop watching every pin and wait for the worker thread to exit
+    '''
+    for pin in list(self.sensors):
+      self.unwatch(pin)
+    self.__stop.set()
+    self.__edges.wake()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def __edge(self, pin, level):
+    # On the GPIO thread: only queue the edge.
+    self.__edges.put((pin, bool(level) == self.active_high, time.time()))
+
+  def __run(self):
+    while not self.__stop.is_set():
+      edge = self.__edges.get(0.1)
+      if edge is None:
+        continue
+      pin, active, timestamp = edge
+      sensor = self.sensors.get(pin)
+      if sensor is None:
+        continue
+      event = DFRobot_AlarmEvent(sensor, pin, active, timestamp)
+      try:
+        event.reading = sensor.read_all()
+      except EnvironmentError:
+        self.errors += 1
+      if event.reading is not None:
+        event.latency = event.reading.timestamp - timestamp
+      self.events += 1
+      try:
+        self.callback(event)
+      except Exception:
+        self.errors += 1
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_async.py
+  @note asyncio client for DFRobot_MultiGasSensor, requires Python 3.5 or later
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import asyncio
+import weakref
+
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_codec import (
+  REQUEST_GET_GAS_CONCENTRATION, REQUEST_GET_TEMP, REQUEST_GET_ALL_DTTA,
+  encode_change_get_method, encode_set_threshold_alarms,
+  decode_change_get_method, decode_set_threshold_alarms)
+
+# Event loop: dict of bus lock: asyncio.Lock, the asyncio counterpart of bus_lock() per loop.
+_bus_async_locks = weakref.WeakKeyDictionary()
+
+def bus_async_lock(lock):
+  '''!
+    @brief Get the asyncio lock serialising the coroutines of the running event loop on one bus
+    @n     The bus lock is re-entrant and every coroutine runs on the loop thread, so it only keeps
+    @n     other threads off the bus, this lock keeps the coroutines of the loop off it.
+    @param lock Bus lock of the sensors, DFRobot_MultiGasSensor.bus_lock
+    @return asyncio.Lock shared by every AsyncMultiGasSensor on the bus in this event loop
+  '''
+  locks = _bus_async_locks.setdefault(asyncio.get_event_loop(), {})
+  async_lock = locks.get(lock)
+  if async_lock is None:
+    async_lock = locks[lock] = asyncio.Lock()
+  return async_lock
+
+
+class AsyncMultiGasSensor(object):
+  '''!
+    @brief Awaitable counterpart of DFRobot_MultiGasSensor.
+    @details Wraps a DFRobot_MultiGasSensor_I2C or DFRobot_MultiGasSensor_UART instance and uses its
+    @n       frame building, parsing, temperature compensation and turnaround strategy, but waits
+    @n       for responses with asyncio.sleep() so one event loop can drive many sensors.
+    @n       Parsed values are stored on the wrapped sensor (gasconcentration, gastype, temp, ...).
+  '''
+  def __init__(self, sensor):
+    '''!
+      @param sensor DFRobot_MultiGasSensor_I2C or DFRobot_MultiGasSensor_UART instance
+    '''
+    self.sensor = sensor
+    self.__uart = isinstance(sensor, DFRobot_MultiGasSensor_UART)
+
+  def __write(self, reg, send, length):
+    if self.__uart:
+      # DFRobot_MultiGasSensor_UART.write_data() also flushes, which waits for the transmission.
+      self.sensor.ser.write(send)
+    else:
+      return self.sensor.write_data(0, send, 9)
+
+  def __read(self, reg, recv, length):
+    if not self.__uart:
+      return self.sensor.read_data(0, recv, 9)
+    ser = self.sensor.ser
+    count = ser.inWaiting()
+    if count != 0:
+      self.sensor.decoder.feed(ser.read(count))
+    for frame in self.sensor.decoder.frames():
+      for i in range(9):
+        recv[i] = frame[i]
+      self.sensor.record_frame(frame)
+      return 9
+    return 0
+
+  async def __exchange(self, send):
+    # The response, None if no valid response was received.
+    recv = bytearray(9)
+    async with bus_async_lock(self.sensor.bus_lock):
+      # The bus lock is shared with threads using the blocking API, never block the event loop on it.
+      while not self.sensor.bus_lock.acquire(False):
+        await asyncio.sleep(0.001)
+      transaction = self.sensor.transaction.begin(send[2], getattr(self.sensor, "decoder", None))
+      valid = False
+      try:
+        if transaction.write(self.__write, send):
+          waits = self.sensor.turnaround.waits()
+          try:
+            delay = next(waits)
+            while True:
+              await asyncio.sleep(delay)
+              valid = transaction.read(self.__read, recv)
+              delay = waits.send(valid)
+          except StopIteration:
+            pass
+      finally:
+        self.sensor.record_transaction(transaction, valid)
+        self.sensor.bus_lock.release()
+    return recv if valid else None
+
+  async def change_acquire_mode(self, mode):
+    '''!
+      @brief Change the mode of reporting data to the main controller after the sensor has collected the gas.
+      @param mode Mode select
+      @n     INITIATIVE The sensor proactively reports data
+      @n     PASSIVITY The sensor can report data only after the main controller sends request to it.
+      @return Return whether the change of gas mode succeed
+    '''
+    recv = await self.__exchange(encode_change_get_method(mode))
+    if recv is None:
+      return False
+    return decode_change_get_method(recv)
+
+  async def read_gas_concentration(self):
+    '''!
+      @brief Get the gas concentration obtained by the sensor, see DFRobot_MultiGasSensor.read_gas_concentration()
+      @return Gas concentration, 0.0 if no valid response was received
+    '''
+    recv = await self.__exchange(REQUEST_GET_GAS_CONCENTRATION)
+    if recv is None or not self.sensor.analysis_gas_concentration(recv):
+      return 0.0
+    if self.sensor.tempSwitch == self.sensor.ON:
+      temp = await self.read_temp()
+      if temp == temp:
+        self.sensor.temp = temp
+    return self.sensor.temp_correction(self.sensor.gasconcentration)
+
+  async def read_temp(self):
+    '''!
+      @brief Get sensor onboard temperature
+      @return Board temperature, unit °C, NaN if the sensor did not answer
+    '''
+    recv = await self.__exchange(REQUEST_GET_TEMP)
+    if recv is None:
+      return float("nan")
+    return self.sensor.analysis_temp(recv)
+
+  async def read_all(self):
+    '''!
+      @brief Get gas concentration, probe type, resolution and board temperature with a single
+      @n     CMD_GET_ALL_DTTA (0x88) request. Use it in PASSIVITY mode.
+      @return DFRobot_GasReading object, or None if no valid response was received
+    '''
+    recv = await self.__exchange(REQUEST_GET_ALL_DTTA)
+    if recv is None:
+      return None
+    return self.sensor.analysis_reading(recv)
+
+  async def set_temp_compensation(self, tempswitch):
+    '''!
+      @brief Set whether to turn on temperature compensation
+      @param tempswitch Temperature compensation switch, ON or OFF
+    '''
+    self.sensor.tempSwitch = tempswitch
+    temp = await self.read_temp()
+    if temp == temp:
+      self.sensor.temp = temp
+
+  async def set_threshold_alarm(self, switchof, threshold):
+    '''!
+      @brief Set sensor alarm threshold
+      @param switchof Set whether to turn on alarm function, ON or OFF
+      @param threshold Set alarm threshold
+      @return Whether setting threshold alarm succeed
+    '''
+    threshold = self.sensor.scale_threshold(threshold)
+    recv = await self.__exchange(encode_set_threshold_alarms(switchof, threshold))
+    if recv is None:
+      return False
+    return decode_set_threshold_alarms(recv)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_codec.py
+  @note Encoding and decoding of the 9-byte frames exchanged with the sensor
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import struct
+from collections import namedtuple
+
+CMD_CHANGE_GET_METHOD     = 0x78
+CMD_GET_GAS_CONCENTRATION = 0x86
+CMD_GET_TEMP              = 0x87
+CMD_GET_ALL_DTTA          = 0x88
+CMD_SET_THRESHOLD_ALARMS  = 0x89
+CMD_IIC_AVAILABLE         = 0x90
+CMD_SENSOR_VOLTAGE        = 0x91
+CMD_CHANGE_IIC_ADDR       = 0x92
+
+FRAME_HEAD   = 0xff
+FRAME_LENGTH = 9
+
+INITIATIVE = 0x03
+PASSIVITY  = 0x04
+
+# | head | cmd | value high | value low | gas type | decimals | temp high | temp low | check |
+_FRAME = struct.Struct(">BBHBBHB")
+
+## CMD_GET_GAS_CONCENTRATION response: raw 16-bit value, gas type byte and decimal digits.
+GasConcentration = namedtuple("GasConcentration", ["raw", "gastype", "decimals"])
+## CMD_GET_ALL_DTTA response, also pushed by the sensor in INITIATIVE mode.
+AllData = namedtuple("AllData", ["raw", "gastype", "decimals", "temp_adc"])
+
+
+def check_sum(frame):
+  '''!
+    @brief CRC check value of a 9-byte frame, the same value as fuc_check_sum(frame,8)
+    @n     The check value covers bytes 1 to 6, as in the C++ library.
+    @param frame Frame, any sequence of byte values
+    @return CRC check value
+  '''
+  return -sum(frame[1:7]) & 0xff
+
+def is_valid(frame, cmd=None):
+  '''!
+    @brief Check the head and CRC of a frame, and optionally the command byte
+    @param frame Received frame
+    @param cmd   Command byte the frame must carry, None to accept any
+    @return True if the frame is valid
+  '''
+  return (frame[0] == FRAME_HEAD and (cmd is None or frame[1] == cmd)
+          and frame[8] == check_sum(frame))
+
+def encode(cmd, *params):
+  '''!
+    @brief Build a request frame
+    @param cmd    Command byte
+    @param params Up to 5 parameter bytes, the remaining ones are set to 0
+    @return Frame as immutable bytes
+  '''
+  frame = bytearray(FRAME_LENGTH)
+  frame[0] = FRAME_HEAD
+  frame[1] = 0x01
+  frame[2] = cmd
+  for i, param in enumerate(params):
+    frame[3 + i] = int(param) & 0xff
+  frame[8] = check_sum(frame)
+  return bytes(frame)
+
+def _buffer(frame):
+  if isinstance(frame, (bytes, bytearray, memoryview)):
+    return frame
+  return bytearray(frame)
+
+
+# Requests that never change are built once.
+REQUEST_GET_GAS_CONCENTRATION = encode(CMD_GET_GAS_CONCENTRATION)
+REQUEST_GET_TEMP              = encode(CMD_GET_TEMP)
+REQUEST_GET_ALL_DTTA          = encode(CMD_GET_ALL_DTTA)
+REQUEST_IIC_AVAILABLE         = encode(CMD_IIC_AVAILABLE)
+REQUEST_SENSOR_VOLTAGE        = encode(CMD_SENSOR_VOLTAGE)
+_REQUEST_CHANGE_GET_METHOD = {
+  INITIATIVE: encode(CMD_CHANGE_GET_METHOD, INITIATIVE),
+  PASSIVITY:  encode(CMD_CHANGE_GET_METHOD, PASSIVITY),
+}
+
+
+def encode_change_get_method(mode):
+  '''!
+    @brief Request frame of CMD_CHANGE_GET_METHOD (0x78)
+    @param mode INITIATIVE or PASSIVITY
+  '''
+  frame = _REQUEST_CHANGE_GET_METHOD.get(mode)
+  if frame is None:
+    frame = encode(CMD_CHANGE_GET_METHOD, mode)
+  return frame
+
+def encode_get_gas_concentration():
+  '''!
+    @brief Request frame of CMD_GET_GAS_CONCENTRATION (0x86)
+  '''
+  return REQUEST_GET_GAS_CONCENTRATION
+
+def encode_get_temp():
+  '''!
+    @brief Request frame of CMD_GET_TEMP (0x87)
+  '''
+  return REQUEST_GET_TEMP
+
+def encode_get_all_data():
+  '''!
+    @brief Request frame of CMD_GET_ALL_DTTA (0x88)
+  '''
+  return REQUEST_GET_ALL_DTTA
+
+def encode_set_threshold_alarms(switchof, threshold):
+  '''!
+    @brief Request frame of CMD_SET_THRESHOLD_ALARMS (0x89)
+    @param switchof  ON or OFF
+    @param threshold Threshold in the units of the sensor, see DFRobot_MultiGasSensor.scale_threshold()
+  '''
+  threshold = int(threshold)
+  return encode(CMD_SET_THRESHOLD_ALARMS, switchof, threshold >> 8, threshold)
+
+def encode_iic_available():
+  '''!
+    @brief Request frame of CMD_IIC_AVAILABLE (0x90)
+  '''
+  return REQUEST_IIC_AVAILABLE
+
+def encode_sensor_voltage():
+  '''!
+    @brief Request frame of CMD_SENSOR_VOLTAGE (0x91)
+  '''
+  return REQUEST_SENSOR_VOLTAGE
+
+def encode_change_iic_addr(group):
+  '''!
+    @brief Request frame of CMD_CHANGE_IIC_ADDR (0x92)
+    @param group The group number that the sensor is supposed to be
+  '''
+  return encode(CMD_CHANGE_IIC_ADDR, group)
+
+
+def decode_change_get_method(frame):
+  '''!
+    @brief Decode a CMD_CHANGE_GET_METHOD (0x78) response
+    @return True if the sensor changed its mode
+  '''
+  return frame[2] == 1
+
+def decode_gas_concentration(frame):
+  '''!
+    @brief Decode a CMD_GET_GAS_CONCENTRATION (0x86) response
+    @return GasConcentration
+  '''
+  _, _, raw, gastype, decimals, _, _ = _FRAME.unpack_from(_buffer(frame))
+  return GasConcentration(raw, gastype, decimals)
+
+def decode_temp(frame):
+  '''!
+    @brief Decode a CMD_GET_TEMP (0x87) response
+    @return 10-bit temperature ADC value
+  '''
+  return _FRAME.unpack_from(_buffer(frame))[2]
+
+def decode_all_data(frame):
+  '''!
+    @brief Decode a CMD_GET_ALL_DTTA (0x88) response
+    @return AllData
+  '''
+  _, _, raw, gastype, decimals, temp_adc, _ = _FRAME.unpack_from(_buffer(frame))
+  return AllData(raw, gastype, decimals, temp_adc)
+
+def decode_set_threshold_alarms(frame):
+  '''!
+    @brief Decode a CMD_SET_THRESHOLD_ALARMS (0x89) response
+    @return True if the threshold was set
+  '''
+  return frame[2] == 1
+
+def decode_iic_available(frame):
+  '''!
+    @brief Decode a CMD_IIC_AVAILABLE (0x90) response
+    @return True if data is available
+  '''
+  return frame[2] == 1
+
+def decode_sensor_voltage(frame):
+  '''!
+    @brief Decode a CMD_SENSOR_VOLTAGE (0x91) response
+    @return Raw 10-bit voltage ADC value, see DFRobot_MultiGasSensor.read_volatage_data()
+  '''
+  return _FRAME.unpack_from(_buffer(frame))[2]
+
+def decode_change_iic_addr(frame):
+  '''!
+    @brief Decode a CMD_CHANGE_IIC_ADDR (0x92) response
+    @return Status byte returned by the sensor
+  '''
+  return frame[2]
+
+
+ENCODERS = {
+  CMD_CHANGE_GET_METHOD:     encode_change_get_method,
+  CMD_GET_GAS_CONCENTRATION: encode_get_gas_concentration,
+  CMD_GET_TEMP:              encode_get_temp,
+  CMD_GET_ALL_DTTA:          encode_get_all_data,
+  CMD_SET_THRESHOLD_ALARMS:  encode_set_threshold_alarms,
+  CMD_IIC_AVAILABLE:         encode_iic_available,
+  CMD_SENSOR_VOLTAGE:        encode_sensor_voltage,
+  CMD_CHANGE_IIC_ADDR:       encode_change_iic_addr,
+}
+
+DECODERS = {
+  CMD_CHANGE_GET_METHOD:     decode_change_get_method,
+  CMD_GET_GAS_CONCENTRATION: decode_gas_concentration,
+  CMD_GET_TEMP:              decode_temp,
+  CMD_GET_ALL_DTTA:          decode_all_data,
+  CMD_SET_THRESHOLD_ALARMS:  decode_set_threshold_alarms,
+  CMD_IIC_AVAILABLE:         decode_iic_available,
+  CMD_SENSOR_VOLTAGE:        decode_sensor_voltage,
+  CMD_CHANGE_IIC_ADDR:       decode_change_iic_addr,
+}
+
+
+def decode(frame):
+  '''!
+    @brief Decode any response frame by its command byte
+    @param frame Received frame
+    @return Typed result of the matching decode_* function, None if the frame is invalid
+    @n      or carries an unknown command
+  '''
+  if not is_valid(frame):
+    return None
+  decoder = DECODERS.get(frame[1])
+  if decoder is None:
+    return None
+  return decoder(frame)
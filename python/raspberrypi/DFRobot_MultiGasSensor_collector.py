@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_collector.py
+  @note Multi-process polling, one worker process per bus, publishing to a shared-memory table.
+  @n    Requires Python 3.8 or later (multiprocessing.shared_memory).
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from DFRobot_MultiGasSensor import (DFRobot_GasReading, DFRobot_MultiGasSensor_I2C, DFRobot_MultiGasSensor_UART,
+                                    UART_PORT, gas_descriptor)
+from DFRobot_MultiGasSensor_fleet import DFRobot_MultiGasSensor_Fleet
+
+# | sequence (uint32) | padding (4) | body |
+# The sequence is odd while the worker writes the body, readers retry until they see the same even value
+# before and after reading it.
+_SEQUENCE = struct.Struct("<I")
+# | timestamp | concentration | gasconcentration | temp | temp_adc | probe type | decimals | readings | failures |
+_BODY = struct.Struct("<ddddHBBII")
+_BODY_OFFSET = 8
+SLOT_SIZE = _BODY_OFFSET + _BODY.size
+
+
+class DFRobot_ReadingsTable(object):
+  '''!
+    @brief Table of the latest reading of every sensor, one fixed-size slot per sensor in a buffer
+    @n     shared between processes. One process writes each slot, any number read it without locks.
+  '''
+  def __init__(self, buf, keys):
+    '''!
+      @param buf  Writable buffer of at least len(keys) * SLOT_SIZE bytes, such as SharedMemory.buf
+      @param keys Sensor keys, in slot order
+    '''
+    self.buf = buf
+    self.keys = list(keys)
+    self.slots = dict((key, slot) for slot, key in enumerate(self.keys))
+
+  def publish(self, slot, body):
+    '''!
+      @brief Write the body of a slot, only one process may write a given slot
+      @param slot Slot number
+      @param body Tuple of the _BODY fields
+    '''
+    offset = slot * SLOT_SIZE
+    sequence = _SEQUENCE.unpack_from(self.buf, offset)[0]
+    _SEQUENCE.pack_into(self.buf, offset, (sequence + 1) & 0xffffffff)
+    _BODY.pack_into(self.buf, offset + _BODY_OFFSET, *body)
+    _SEQUENCE.pack_into(self.buf, offset, (sequence + 2) & 0xffffffff)
+
+  def body(self, key):
+    '''!
+      @brief Consistent copy of the body of a slot
+      @return Tuple of the _BODY fields, None if nothing was published yet
+    '''
+    offset = self.slots[key] * SLOT_SIZE
+    while True:
+      before = _SEQUENCE.unpack_from(self.buf, offset)[0]
+      if before == 0:
+        return None
+      if before & 1:
+        continue
+      body = _BODY.unpack_from(self.buf, offset + _BODY_OFFSET)
+      if _SEQUENCE.unpack_from(self.buf, offset)[0] == before:
+        return body
+
+  def read(self, key):
+    '''!
+      @brief Latest reading of a sensor
+      @param key Sensor key
+      @return DFRobot_GasReading, None if the sensor has not answered yet
+    '''
+    body = self.body(key)
+    if body is None or body[7] == 0:
+      return None
+    timestamp, concentration, gasconcentration, temp, temp_adc, probe_type, decimals = body[:7]
+    descriptor = gas_descriptor(probe_type, decimals)
+    reading = DFRobot_GasReading(concentration, gasconcentration, descriptor.gastype, descriptor.units,
+                                 temp, probe_type, decimals, temp_adc)
+    reading.timestamp = timestamp
+    return reading
+
+  def read_all(self):
+    '''!
+      @return dict of sensor key: DFRobot_GasReading or None
+    '''
+    return dict((key, self.read(key)) for key in self.keys)
+
+  def counters(self, key):
+    '''!
+      @return (readings, failures) of a sensor, the number of polls with and without a valid reading
+    '''
+    body = self.body(key)
+    return (0, 0) if body is None else (body[7], body[8])
+
+
+def i2c_sensors(bus, addresses):
+  '''!
+    @brief Sensor factory of DFRobot_FleetCollector.add_bus() for sensors on one I2C bus
+    @param bus       I2C bus number
+    @param addresses I2C addresses of the sensors
+    @return List of DFRobot_MultiGasSensor_I2C instances
+  '''
+  return [DFRobot_MultiGasSensor_I2C(bus, addr) for addr in addresses]
+
+def uart_sensors(baud, port=UART_PORT):
+  '''!
+    @brief Sensor factory of DFRobot_FleetCollector.add_bus() for the sensor on a serial port
+    @param baud UART baud rate
+    @param port Serial port
+    @return List of one DFRobot_MultiGasSensor_UART instance
+  '''
+  return [DFRobot_MultiGasSensor_UART(baud, port=port)]
+
+def _worker(shm_name, keys, first_slot, count, factory, args, interval, stop):
+  shm = shared_memory.SharedMemory(name=shm_name)
+  try:
+    table = DFRobot_ReadingsTable(shm.buf, keys)
+    sensors = factory(*args)
+    if len(sensors) != count:
+      raise ValueError("factory returned %d sensors for %d keys" % (len(sensors), count))
+    if len(sensors) > 1 and all(isinstance(sensor, DFRobot_MultiGasSensor_I2C) for sensor in sensors):
+      poll = DFRobot_MultiGasSensor_Fleet(sensors).read_all
+    else:
+      poll = lambda: [sensor.read_all() for sensor in sensors]
+    bodies = [(0.0, 0.0, 0.0, 0.0, 0, 0, 0, 0, 0)] * len(sensors)
+    deadline = time.time()
+    while not stop.is_set():
+      try:
+        readings = poll()
+      except EnvironmentError:
+        readings = [None] * len(sensors)
+      for i, reading in enumerate(readings):
+        old = bodies[i]
+        if reading is None:
+          bodies[i] = old[:8] + (old[8] + 1,)
+        else:
+          bodies[i] = (reading.timestamp, reading.concentration, reading.gasconcentration, reading.temp,
+                       reading.temp_adc, reading.probe_type, reading.decimals, old[7] + 1, old[8])
+        table.publish(first_slot + i, bodies[i])
+      deadline = max(deadline + interval, time.time())
+      stop.wait(deadline - time.time())
+  finally:
+    shm.close()
+
+
+class DFRobot_FleetCollector(object):
+  '''!
+    @brief Polls the sensors of several buses in parallel, one worker process per I2C bus or serial
+    @n     port, so the bus I/O and the parsing and compensation of each bus use their own core.
+    @details Every worker creates its sensors with a factory function, polls them every interval
+    @n       (pipelined with DFRobot_MultiGasSensor_Fleet when it has several I2C sensors) and
+    @n       publishes each reading into a DFRobot_ReadingsTable in shared memory. read() and
+    @n       read_all() then return the latest readings without any message to the workers.
+    @n       The sensors must be in PASSIVITY mode.
+  '''
+  def __init__(self, interval=1.0, context=None):
+    '''!
+      @param interval Seconds between two polls of a bus
+      @param context  multiprocessing context, None for the default one
+    '''
+    self.interval = interval
+    self.context = context or multiprocessing
+    self.keys = []
+    self.table = None
+    self.__buses = []          # (first slot, keys, factory, args)
+    self.__workers = []
+    self.__shm = None
+    self.__stop = None
+
+  def add_bus(self, keys, factory, *args):
+    '''!
+      @brief Add a worker process
+      @param keys    Keys of the sensors the factory creates, in the same order
+      @param factory Picklable function called with args in the worker, returning the list of
+      @n             sensors, for example i2c_sensors or uart_sensors
+      @param args    Arguments of the factory
+    '''
+    if self.__workers:
+      raise RuntimeError("add buses before start()")
+    keys = list(keys)
+    if set(keys) & set(self.keys):
+      raise ValueError("duplicate sensor keys")
+    self.__buses.append((len(self.keys), keys, factory, args))
+    self.keys.extend(keys)
+
+  def add_i2c_bus(self, bus, addresses):
+    '''!
+      @brief Add a worker polling sensors on one I2C bus, their keys are "i2c-<bus>/0x<address>"
+    '''
+    self.add_bus(["i2c-%d/0x%02X" % (bus, addr) for addr in addresses], i2c_sensors, bus, list(addresses))
+
+  def add_uart(self, port, baud=9600):
+    '''!
+      @brief Add a worker polling the sensor on a serial port, its key is "uart-<port>"
+    '''
+    self.add_bus(["uart-%s" % port], uart_sensors, baud, port)
+
+  def start(self):
+    '''!
+      @brief Create the shared table and start the workers
+      @return self
+    '''
+    if self.__workers:
+      return self
+    self.__shm = shared_memory.SharedMemory(create=True, size=max(len(self.keys), 1) * SLOT_SIZE)
+    self.table = DFRobot_ReadingsTable(self.__shm.buf, self.keys)
+    self.__stop = self.context.Event()
+    for first_slot, keys, factory, args in self.__buses:
+      worker = self.context.Process(target=_worker, name="DFRobot_FleetCollector-%s" % keys[0],
+                                    args=(self.__shm.name, self.keys, first_slot, len(keys), factory, args,
+                                          self.interval, self.__stop))
+      worker.daemon = True
+      worker.start()
+      self.__workers.append(worker)
+    return self
+
+  def stop(self):
+    '''!
+      @brief Stop the workers and release the shared table
+    '''
+    if self.__stop is not None:
+      self.__stop.set()
+    for worker in self.__workers:
+      worker.join()
+    self.__workers = []
+    if self.__shm is not None:
+      self.table = None
+      self.__shm.close()
+      self.__shm.unlink()
+      self.__shm = None
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def alive(self):
+    '''!
+      @return Number of worker processes running
+    '''
+    return sum(1 for worker in self.__workers if worker.is_alive())
+
+  def read(self, key):
+    '''!
+      @brief Latest reading of a sensor, read from shared memory
+      @return DFRobot_GasReading, None if the sensor has not answered yet
+    '''
+    return self.table.read(key)
+
+  def read_all(self):
+    '''!
+      @return dict of sensor key: latest DFRobot_GasReading or None
+    '''
+    return self.table.read_all()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_fleet.py
+  @note Pipelined polling of several I2C sensors sharing one bus
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import time
+import heapq
+
+from DFRobot_MultiGasSensor import CMD_GET_ALL_DTTA, REQUEST_GET_ALL_DTTA
+
+
+class DFRobot_MultiGasSensor_Fleet(object):
+  '''!
+    @brief Polls a group of DFRobot_MultiGasSensor_I2C sensors, for example up to 32 probes
+    @n     using the 0x60~0x7F address groups on one bus.
+    @details The request is sent to every sensor first and the responses are collected afterwards,
+    @n       so the sensors process their requests at the same time and a sweep takes about one
+    @n       turnaround time instead of one per sensor. All sensors must be in PASSIVITY mode.
+    @n       The bus locks of the sensors are held for the whole sweep.
+  '''
+  def __init__(self, sensors):
+    '''!
+      @param sensors List of DFRobot_MultiGasSensor_I2C instances. Each response is waited for
+      @n             with the turnaround strategy of its sensor, see set_turnaround().
+    '''
+    self.sensors = list(sensors)
+
+  def read_all(self):
+    '''!
+      @brief Read all the data of every sensor with one CMD_GET_ALL_DTTA (0x88) request each
+      @return List of DFRobot_GasReading objects in the order of the sensors,
+      @n      None for the sensors that did not answer with a valid frame in time
+    '''
+    locks = []
+    for sensor in self.sensors:
+      if not any(lock is sensor.bus_lock for lock in locks):
+        locks.append(sensor.bus_lock)
+    for lock in locks:
+      lock.acquire()
+    try:
+      return self.__sweep()
+    finally:
+      for lock in reversed(locks):
+        lock.release()
+
+  def __sweep(self):
+    readings = [None] * len(self.sensors)
+    transactions = [None] * len(self.sensors)
+    pending = []
+    try:
+      for i, sensor in enumerate(self.sensors):
+        transactions[i] = sensor.transaction.begin(CMD_GET_ALL_DTTA)
+        if not transactions[i].write(sensor.write_data, REQUEST_GET_ALL_DTTA):
+          continue
+        waits = sensor.turnaround.waits()
+        heapq.heappush(pending, (time.time() + next(waits), i, waits))
+      recvbuf = bytearray(9)
+      while pending:
+        ready, i, waits = heapq.heappop(pending)
+        delay = ready - time.time()
+        if delay > 0:
+          time.sleep(delay)
+        sensor = self.sensors[i]
+        valid = transactions[i].read(sensor.read_data, recvbuf)
+        if valid:
+          readings[i] = sensor.analysis_reading(recvbuf)
+        try:
+          delay = waits.send(valid)
+        except StopIteration:
+          continue
+        heapq.heappush(pending, (time.time() + delay, i, waits))
+    finally:
+      for i, sensor in enumerate(self.sensors):
+        if transactions[i] is not None:
+          sensor.record_transaction(transactions[i], readings[i] is not None)
+    return readings
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_history.py
+  @note Compact columnar history of the readings of a sensor, for logging at high rates
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import array
+import threading
+
+from DFRobot_MultiGasSensor import DFRobot_GasReading, adc_to_temp, compensate, gas_descriptor
+
+## Columns of DFRobot_ReadingHistory: name -> array.array typecode.
+## 14 bytes per reading, against several hundred for a DFRobot_GasReading or a dict.
+COLUMNS = (
+  ("timestamp", "d"),   # time.time() of the reading
+  ("raw",       "H"),   # Concentration as sent by the probe, before scaling by the resolution
+  ("decimals",  "B"),   # 0: resolution 1, 1: resolution 0.1, 2: resolution 0.01
+  ("temp_adc",  "H"),   # 10-bit A/D measurement of the board thermistor
+  ("gastype",   "B"),   # Gas type byte reported by the probe
+)
+
+
+class DFRobot_ReadingHistory(object):
+  '''!
+    @brief Keeps every reading of a sensor as the raw values of its frame, one array.array per column.
+    @details Attach it with DFRobot_MultiGasSensor.set_history(), every CMD_GET_ALL_DTTA (0x88)
+    @n       response parsed by the sensor (read_all(), stream(), replay()) is then appended.
+    @n       The floats are only computed when asked for with concentrations(), temps() or
+    @n       readings. columns() and numpy() export the storage without copying it. An array with
+    @n       a live view cannot grow, so append() then moves the history to copies of its arrays:
+    @n       the views keep the readings they were taken with and the history keeps growing.
+  '''
+  def __init__(self):
+    self.__lock = threading.Lock()
+    self.clear()
+
+  def clear(self):
+    '''!
+      @brief Drop every reading
+    '''
+    with self.__lock:
+      self.timestamp = array.array("d")
+      self.raw = array.array("H")
+      self.decimals = array.array("B")
+      self.temp_adc = array.array("H")
+      self.gastype = array.array("B")
+
+  def __len__(self):
+    return len(self.timestamp)
+
+  def append(self, timestamp, raw, decimals, temp_adc, gastype):
+    '''!
+      @brief Append one reading
+      @param timestamp time.time() of the reading
+      @param raw       Concentration bytes 2 and 3 of the frame, as an integer
+      @param decimals  Decimals byte of the frame
+      @param temp_adc  Temperature bytes 6 and 7 of the frame, as an integer
+      @param gastype   Gas type byte of the frame
+    '''
+    with self.__lock:
+      try:
+        self.timestamp.append(timestamp)
+        self.raw.append(raw)
+        self.decimals.append(decimals)
+        self.temp_adc.append(temp_adc)
+        self.gastype.append(gastype)
+      except BufferError:
+        # A column is exported by columns() or numpy(): undo this row so the columns stay
+        # aligned, leave the exported arrays to their views and append to copies instead.
+        size = len(self.gastype)
+        for name, _ in COLUMNS:
+          setattr(self, name, getattr(self, name)[:size])
+        self.timestamp.append(timestamp)
+        self.raw.append(raw)
+        self.decimals.append(decimals)
+        self.temp_adc.append(temp_adc)
+        self.gastype.append(gastype)
+
+  def append_frame(self, frame, timestamp):
+    '''!
+      @brief Append the reading of a valid CMD_GET_ALL_DTTA (0x88) response frame
+      @param frame     9-byte frame
+      @param timestamp time.time() of the reading
+    '''
+    self.append(timestamp, (frame[2] << 8) | frame[3], frame[5], (frame[6] << 8) | frame[7], frame[4])
+
+  def columns(self):
+    '''!
+      @brief The storage of every column, without copying
+      @return dict of column name: memoryview
+    '''
+    with self.__lock:
+      return dict((name, memoryview(getattr(self, name))) for name, _ in COLUMNS)
+
+  def numpy(self):
+    '''!
+      @brief The storage of every column as NumPy arrays sharing its memory, requires NumPy
+      @return dict of column name: numpy.ndarray
+    '''
+    import numpy as np
+    return dict((name, np.frombuffer(view, dtype=view.format)) for name, view in self.columns().items())
+
+  def concentrations(self, compensated=False):
+    '''!
+      @brief Decode the concentrations
+      @param compensated True to apply the temperature compensation of each gas type, as
+      @n     read_gas_concentration() does with set_temp_compensation(ON)
+      @return array.array("d"), one value per reading
+    '''
+    with self.__lock:
+      rows = zip(self.raw, self.decimals, self.temp_adc, self.gastype)
+      values = array.array("d")
+      for raw, decimals, temp_adc, gastype in rows:
+        descriptor = gas_descriptor(gastype, decimals)
+        value = raw * descriptor.resolution
+        if compensated:
+          value = compensate(descriptor.compensation, adc_to_temp(temp_adc), value)
+        values.append(value)
+      return values
+
+  def temps(self):
+    '''!
+      @brief Decode the board temperatures
+      @return array.array("d"), unit °C, one value per reading
+    '''
+    with self.__lock:
+      return array.array("d", [adc_to_temp(adc) for adc in self.temp_adc])
+
+  def __getitem__(self, index):
+    '''!
+      @brief Rebuild one reading
+      @param index Position of the reading, negative values count from the end
+      @return DFRobot_GasReading, concentration is not temperature compensated
+    '''
+    with self.__lock:
+      timestamp = self.timestamp[index]
+      raw = self.raw[index]
+      decimals = self.decimals[index]
+      temp_adc = self.temp_adc[index]
+      code = self.gastype[index]
+    descriptor = gas_descriptor(code, decimals)
+    concentration = raw * descriptor.resolution
+    reading = DFRobot_GasReading(concentration, concentration, descriptor.gastype, descriptor.units,
+                                 adc_to_temp(temp_adc), code, decimals, temp_adc)
+    reading.timestamp = timestamp
+    return reading
+
+  def __iter__(self):
+    for index in range(len(self)):
+      yield self[index]
+
+  def nbytes(self):
+    '''!
+      @brief Memory used by the stored values, without the spare capacity of the arrays
+    '''
+    return sum(len(getattr(self, name)) * getattr(self, name).itemsize for name, _ in COLUMNS)
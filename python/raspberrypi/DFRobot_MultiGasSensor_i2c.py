@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_i2c.py
+  @note I2C buses of the sensors: smbus2 with raw i2c_msg transfers when installed, smbus otherwise
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import ctypes
+import threading
+
+# Largest read of the library, bytes.
+_READ_SIZE = 32
+
+
+def open_i2c_bus(bus):
+  '''!
+    @brief Open an I2C bus for DFRobot_MultiGasSensor_I2C
+    @param bus I2C bus number
+    @return DFRobot_SMBus2Bus if smbus2 is installed, smbus.SMBus otherwise
+  '''
+  try:
+    import smbus2
+  except ImportError:
+    import smbus
+    return smbus.SMBus(bus)
+  return DFRobot_SMBus2Bus(bus)
+
+
+class DFRobot_SMBus2Bus(object):
+  '''!
+    @brief I2C bus doing every transfer of the library as one I2C_RDWR ioctl of smbus2.
+    @details write_i2c_block_data() is a single write message and read_i2c_block_data() a
+    @n       combined register write and read with a repeated start, as with smbus, but on
+    @n       i2c_msg buffers allocated once per address and reused, so no message or list is built
+    @n       per transfer. Adapters without plain I2C support (SMBus-only controllers) fall back
+    @n       to the block transfers of smbus2.
+  '''
+  def __init__(self, bus, smbus=None):
+    '''!
+      @param bus   I2C bus number
+      @param smbus Open smbus2.SMBus to use instead of opening the bus
+    '''
+    import smbus2
+    self.i2c_msg = smbus2.i2c_msg
+    self.smbus = smbus if smbus is not None else smbus2.SMBus(bus)
+    self.rdwr = bool(self.smbus.funcs & smbus2.I2cFunc.I2C)   # False: use the block transfers.
+    self.transfers = 0             # I2C_RDWR ioctls issued.
+    self.__messages = {}
+    self.__lock = threading.Lock()
+
+  def __messages_of(self, addr):
+    # (write buffer, write message, register buffer, register message, read buffer, read message) of an address.
+    messages = self.__messages.get(addr)
+    if messages is None:
+      write = self.i2c_msg.write(addr, bytearray(_READ_SIZE + 1))
+      register = self.i2c_msg.write(addr, bytearray(1))
+      read = self.i2c_msg.read(addr, _READ_SIZE)
+      messages = self.__messages[addr] = (write.buf, write, register.buf, register, read.buf, read)
+    return messages
+
+  def write_i2c_block_data(self, addr, reg, data):
+    if not self.rdwr:
+      return self.smbus.write_i2c_block_data(addr, reg, list(data))
+    frame = bytearray([reg])
+    frame += bytearray(data)
+    with self.__lock:
+      buf, write, _, _, _, _ = self.__messages_of(addr)
+      ctypes.memmove(buf, bytes(frame), len(frame))
+      write.len = len(frame)
+      self.transfers += 1
+      self.smbus.i2c_rdwr(write)
+
+  def read_i2c_block_data(self, addr, reg, length):
+    if not self.rdwr:
+      return self.smbus.read_i2c_block_data(addr, reg, length)
+    with self.__lock:
+      _, _, regbuf, register, buf, read = self.__messages_of(addr)
+      ctypes.memmove(regbuf, bytes(bytearray([reg])), 1)
+      read.len = length
+      self.transfers += 1
+      self.smbus.i2c_rdwr(register, read)
+      return bytearray(buf[:length])
+
+  def close(self):
+    self.smbus.close()
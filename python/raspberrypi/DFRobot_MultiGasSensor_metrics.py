@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_metrics.py
+  @note Per-command transaction counters and latency histograms of the sensors and buses
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import threading
+import time
+
+from DFRobot_MultiGasSensor_codec import FRAME_HEAD, is_valid
+
+## Upper bounds of the transaction latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+# Counters of DFRobot_CommandMetrics, in exposition order.
+_COUNTERS = ("transactions", "timeouts", "io_errors", "checksum_errors", "retries")
+
+
+class DFRobot_Transaction(object):
+  '''!
+    @brief Timing and errors of one request/response exchange, filled in by the code driving the bus.
+    @n     write() and read() wrap the write_data() and read_data() calls of a sensor, the time spent
+    @n     outside of them is counted as waiting for the sensor. Every sensor owns one, reused by
+    @n     begin() for each of its transactions under the bus lock, so none is allocated per command.
+  '''
+  __slots__ = ("cmd", "start", "transfer", "wait", "reads", "checksum_errors", "io_errors", "decoder",
+               "__bad_frames")
+
+  def __init__(self, cmd=0, decoder=None):
+    '''!
+      @param cmd     Command byte of the request
+      @param decoder DFRobot_FrameDecoder of a UART sensor, its dropped frames count as checksum errors
+    '''
+    self.begin(cmd, decoder)
+
+  def begin(self, cmd, decoder=None):
+    '''!
+      @brief Start a new transaction, clearing the counters of the previous one
+      @param cmd     Command byte of the request
+      @param decoder DFRobot_FrameDecoder of a UART sensor, its dropped frames count as checksum errors
+      @return self
+    '''
+    self.cmd = cmd
+    self.start = time.time()
+    self.transfer = 0.0        # Seconds spent in write() and read().
+    self.wait = 0.0            # Seconds spent outside of them, set by finish().
+    self.reads = 0
+    self.checksum_errors = 0   # Responses to the command with a wrong check value.
+    self.io_errors = 0
+    self.decoder = decoder
+    self.__bad_frames = decoder.bad_frames if decoder is not None else 0
+    return self
+
+  def write(self, write_data, send):
+    '''!
+      @brief Send the request
+      @param write_data write_data() method of the sensor
+      @param send       Request frame
+      @return False if the write failed
+    '''
+    start = time.time()
+    try:
+      if write_data(0, send, 9) == -1:
+        self.io_errors += 1
+        return False
+      return True
+    except EnvironmentError:
+      self.io_errors += 1
+      raise
+    finally:
+      self.transfer += time.time() - start
+
+  def read(self, read_data, recv):
+    '''!
+      @brief Read a response
+      @param read_data read_data() method of the sensor
+      @param recv      Buffer the response is read into
+      @return True if recv holds a valid response to the command
+    '''
+    start = time.time()
+    self.reads += 1
+    try:
+      if read_data(0, recv, 9) == -1:
+        self.io_errors += 1
+        return False
+    except EnvironmentError:
+      self.io_errors += 1
+      raise
+    finally:
+      self.transfer += time.time() - start
+    if is_valid(recv, self.cmd):
+      return True
+    if recv[0] == FRAME_HEAD and recv[1] == self.cmd:
+      self.checksum_errors += 1
+    return False
+
+  def finish(self):
+    '''!
+      @brief Stop the clock, setting wait
+    '''
+    if self.decoder is not None:
+      self.checksum_errors += self.decoder.bad_frames - self.__bad_frames
+      self.__bad_frames = self.decoder.bad_frames
+    wait = time.time() - self.start - self.transfer
+    self.wait = wait if wait > 0.0 else 0.0
+
+
+class DFRobot_CommandMetrics(object):
+  '''!
+    @brief Counters and latency histogram of one command byte
+  '''
+  def __init__(self):
+    self.timeouts = 0          # Transactions without a valid response and without I/O error.
+    self.io_errors = 0         # Failed reads and writes.
+    self.checksum_errors = 0
+    self.retries = 0           # Reads after the first one of a transaction.
+    self.transfer_seconds = 0.0
+    self.wait_seconds = 0.0
+    self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+  @property
+  def transactions(self):
+    # Every transaction lands in one latency bucket, one counter less to update per transaction.
+    return sum(self.buckets)
+
+  def stats(self):
+    stats = dict((name, getattr(self, name)) for name in _COUNTERS)
+    stats["transfer_seconds"] = self.transfer_seconds
+    stats["wait_seconds"] = self.wait_seconds
+    cumulative = 0
+    histogram = []
+    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+      cumulative += count
+      histogram.append((bound, cumulative))
+    stats["latency_buckets"] = histogram
+    return stats
+
+
+class DFRobot_Metrics(object):
+  '''!
+    @brief Transaction metrics of one sensor or one bus, per command byte
+  '''
+  def __init__(self, labels):
+    '''!
+      @param labels dict of Prometheus labels identifying the sensor or the bus
+    '''
+    self.labels = labels
+    self.created = time.time()
+    self.busy_seconds = 0.0
+    self.commands = {}
+    self.__lock = threading.Lock()
+
+  def record(self, transaction, valid):
+    '''!
+      @brief Add a finished transaction
+      @param transaction DFRobot_Transaction, after its finish()
+      @param valid       Whether a valid response was received
+    '''
+    transfer = transaction.transfer
+    wait = transaction.wait
+    latency = transfer + wait
+    bucket = 0
+    while bucket < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[bucket]:
+      bucket += 1
+    # acquire()/release() rather than a with block, which allocates on every call.
+    self.__lock.acquire()
+    try:
+      metrics = self.commands.get(transaction.cmd)
+      if metrics is None:
+        metrics = self.commands[transaction.cmd] = DFRobot_CommandMetrics()
+      if not valid and transaction.io_errors == 0:
+        metrics.timeouts += 1
+      metrics.io_errors += transaction.io_errors
+      metrics.checksum_errors += transaction.checksum_errors
+      if transaction.reads > 1:
+        metrics.retries += transaction.reads - 1
+      metrics.transfer_seconds += transfer
+      metrics.wait_seconds += wait
+      metrics.buckets[bucket] += 1
+      self.busy_seconds += latency
+    finally:
+      self.__lock.release()
+
+  def stats(self):
+    '''!
+      @brief Snapshot of the metrics
+      @return dict with labels, uptime_seconds, busy_seconds, utilisation (busy time / uptime) and
+      @n      commands, a dict of "0x88"-style command names: dict of transactions, timeouts,
+      @n      io_errors, checksum_errors, retries, transfer_seconds, wait_seconds and latency_buckets
+      @n      (list of (upper bound, cumulative count))
+    '''
+    with self.__lock:
+      uptime = time.time() - self.created
+      return {
+        "labels": dict(self.labels),
+        "uptime_seconds": uptime,
+        "busy_seconds": self.busy_seconds,
+        "utilisation": self.busy_seconds / uptime if uptime > 0 else 0.0,
+        "commands": dict(("0x%02X" % cmd, metrics.stats()) for cmd, metrics in sorted(self.commands.items())),
+      }
+
+
+_bus_metrics = {}
+_bus_metrics_guard = threading.Lock()
+
+def bus_name(key):
+  '''!
+    @brief Readable name of a bus
+    @param key Bus identifier, as given to bus_lock()
+  '''
+  kind, bus = key
+  if isinstance(bus, (int, str)):
+    return "%s-%s" % (kind, bus)
+  return "%s-%s@%x" % (kind, type(bus).__name__, id(bus))
+
+def bus_metrics(key):
+  '''!
+    @brief Get the metrics shared by every sensor on one bus
+    @param key Bus identifier, as given to bus_lock()
+    @return DFRobot_Metrics
+  '''
+  with _bus_metrics_guard:
+    metrics = _bus_metrics.get(key)
+    if metrics is None:
+      metrics = _bus_metrics[key] = DFRobot_Metrics({"bus": bus_name(key)})
+    return metrics
+
+def bus_stats():
+  '''!
+    @brief Metrics of every bus in use
+    @return dict of bus name: DFRobot_Metrics.stats()
+  '''
+  with _bus_metrics_guard:
+    buses = list(_bus_metrics.values())
+  return dict((metrics.labels["bus"], metrics.stats()) for metrics in buses)
+
+
+def _label_text(labels):
+  return ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                  for name, value in sorted(labels.items()))
+
+def _exposition(prefix, stats_list):
+  lines = []
+  def family(name, kind, help):
+    lines.append("# HELP %s%s %s" % (prefix, name, help))
+    lines.append("# TYPE %s%s %s" % (prefix, name, kind))
+  def sample(name, labels, value):
+    lines.append("%s%s{%s} %s" % (prefix, name, _label_text(labels), repr(float(value))
+                                  if isinstance(value, float) else value))
+  help = {
+    "transactions": "Request/response exchanges.",
+    "timeouts":     "Exchanges without a valid response.",
+    "io_errors":    "Failed bus reads and writes.",
+    "checksum_errors": "Responses with a wrong check value.",
+    "retries":      "Response reads after the first one.",
+  }
+  for counter in _COUNTERS:
+    family(counter + "_total", "counter", help[counter])
+    for stats in stats_list:
+      for cmd, metrics in stats["commands"].items():
+        sample(counter + "_total", dict(stats["labels"], cmd=cmd), metrics[counter])
+  for name, text in (("transfer", "Time spent reading and writing."), ("wait", "Time spent waiting for responses.")):
+    family(name + "_seconds_total", "counter", text)
+    for stats in stats_list:
+      for cmd, metrics in stats["commands"].items():
+        sample(name + "_seconds_total", dict(stats["labels"], cmd=cmd), metrics[name + "_seconds"])
+  family("transaction_seconds", "histogram", "Exchange latency.")
+  for stats in stats_list:
+    for cmd, metrics in stats["commands"].items():
+      labels = dict(stats["labels"], cmd=cmd)
+      for bound, count in metrics["latency_buckets"]:
+        sample("transaction_seconds_bucket", dict(labels, le="+Inf" if bound == float("inf") else repr(bound)), count)
+      sample("transaction_seconds_sum", labels, metrics["transfer_seconds"] + metrics["wait_seconds"])
+      sample("transaction_seconds_count", labels, metrics["transactions"])
+  family("busy_seconds_total", "counter", "Time spent in exchanges.")
+  for stats in stats_list:
+    sample("busy_seconds_total", stats["labels"], stats["busy_seconds"])
+  family("utilisation", "gauge", "Busy time over uptime.")
+  for stats in stats_list:
+    sample("utilisation", stats["labels"], stats["utilisation"])
+  return lines
+
+def prometheus_text(sensors=()):
+  '''!
+    @brief Metrics in the Prometheus text exposition format
+    @param sensors Sensors whose own metrics are included, the metrics of every bus are always included
+    @return str, dfrobot_gas_* families labelled by sensor and dfrobot_gas_bus_* families labelled by bus
+  '''
+  lines = _exposition("dfrobot_gas_", [sensor.stats() for sensor in sensors])
+  lines += _exposition("dfrobot_gas_bus_", [stats for _, stats in sorted(bus_stats().items())])
+  return "\n".join(lines) + "\n"
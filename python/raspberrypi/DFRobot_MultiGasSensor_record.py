@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_record.py
+  @note Append-only recording of raw sensor frames and memory-mapped replay, the reader requires NumPy
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import os
+import struct
+import threading
+import time
+
+from DFRobot_MultiGasSensor import TEMP_TABLE, GAS_TYPE_CODES, temp_compensation_batch
+from DFRobot_MultiGasSensor_codec import CMD_GET_ALL_DTTA, FRAME_HEAD, FRAME_LENGTH
+
+# | magic (8) | record size (uint32) | reserved (4) |
+MAGIC = b"DFRMGS01"
+_HEADER = struct.Struct("<8sI4x")
+HEADER_SIZE = _HEADER.size
+# | timestamp (float64) | address (uint16) | frame (9 bytes) | padding (5) |
+_RECORD = struct.Struct("<dH9s5x")
+RECORD_SIZE = _RECORD.size
+
+_monotonic = getattr(time, "monotonic", time.time)
+
+
+def record_dtype():
+  '''!
+    @brief NumPy structured dtype of one record, requires NumPy
+    @return numpy.dtype with the fields timestamp, address and frame
+  '''
+  import numpy as np
+  return np.dtype({
+    "names":    ["timestamp", "address", "frame"],
+    "formats":  ["<f8", "<u2", ("u1", FRAME_LENGTH)],
+    "offsets":  [0, 8, 10],
+    "itemsize": RECORD_SIZE,
+  })
+
+
+class DFRobot_FrameRecorder(object):
+  '''!
+    @brief Appends raw 9-byte frames to a fixed-width binary file.
+    @details Every record holds a timestamp, the sensor address and the frame exactly as it was
+    @n       received, so the derived values can be recomputed later with DFRobot_FrameReplay.
+    @n       Attach it to sensors with DFRobot_MultiGasSensor.set_recorder(). Several sensors and
+    @n       threads may share one recorder.
+  '''
+  def __init__(self, path, clock=None):
+    '''!
+      @param path  File to append to, created with a header if it does not exist
+      @param clock Function returning the timestamp in seconds, time.monotonic by default
+    '''
+    self.path = path
+    self.clock = clock or _monotonic
+    self.__lock = threading.Lock()
+    self.__file = open(path, "ab")
+    size = os.path.getsize(path)
+    if size == 0:
+      self.__file.write(_HEADER.pack(MAGIC, RECORD_SIZE))
+    else:
+      check_header(path)
+      # Drop a record cut short by a crash so the following ones stay aligned.
+      tail = (size - HEADER_SIZE) % RECORD_SIZE
+      if tail:
+        self.__file.truncate(size - tail)
+
+  def record(self, address, frame, timestamp=None):
+    '''!
+      @brief Append one frame
+      @param address   Sensor address, 0~0xFFFF
+      @param frame     Raw 9-byte frame
+      @param timestamp Timestamp in seconds, None to read the clock
+    '''
+    if timestamp is None:
+      timestamp = self.clock()
+    data = _RECORD.pack(timestamp, address, bytes(bytearray(frame[:FRAME_LENGTH])))
+    with self.__lock:
+      self.__file.write(data)
+
+  def flush(self):
+    '''!
+      @brief Write the buffered records to the file
+    '''
+    with self.__lock:
+      self.__file.flush()
+
+  def close(self):
+    '''!
+      @brief Flush and close the file
+    '''
+    with self.__lock:
+      self.__file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def check_header(path):
+  '''!
+    @brief Check that a file was written by DFRobot_FrameRecorder
+    @param path File to check
+    @exception ValueError The header is missing or does not match
+  '''
+  with open(path, "rb") as f:
+    header = f.read(HEADER_SIZE)
+  if len(header) != HEADER_SIZE:
+    raise ValueError("%s: no frame record header" % path)
+  magic, size = _HEADER.unpack(header)
+  if magic != MAGIC or size != RECORD_SIZE:
+    raise ValueError("%s: not a frame record file" % path)
+
+
+class DFRobot_FrameReplay(object):
+  '''!
+    @brief Memory-mapped reader of the files written by DFRobot_FrameRecorder, requires NumPy.
+    @details The records are exposed as a NumPy structured array backed by the file, nothing is
+    @n       copied until a field is computed on. Records appended after opening are not seen,
+    @n       open the file again to pick them up.
+  '''
+  def __init__(self, path):
+    '''!
+      @param path File written by DFRobot_FrameRecorder
+    '''
+    import numpy as np
+    check_header(path)
+    self.path = path
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    if count:
+      self.records = np.memmap(path, dtype=record_dtype(), mode="r", offset=HEADER_SIZE, shape=(count,))
+    else:
+      self.records = np.zeros(0, dtype=record_dtype())
+
+  def __len__(self):
+    return len(self.records)
+
+  def valid(self, cmd=CMD_GET_ALL_DTTA):
+    '''!
+      @brief Mask of the records holding a valid frame
+      @param cmd Command byte the frames must carry, None to accept any
+      @return numpy.ndarray of bool
+    '''
+    import numpy as np
+    frames = self.records["frame"]
+    check = (-frames[:, 1:7].sum(axis=1, dtype=np.int64)) & 0xff
+    mask = (frames[:, 0] == FRAME_HEAD) & (frames[:, 8] == check)
+    if cmd is not None:
+      mask &= frames[:, 1] == cmd
+    return mask
+
+  def all_data(self, address=None):
+    '''!
+      @brief Decode every valid CMD_GET_ALL_DTTA (0x88) frame, as analysis_all_data() does,
+      @n     with temperature compensation applied.
+      @param address Only decode the frames of this sensor address, None for all
+      @return dict of equally long numpy arrays: timestamp, address, raw, gastype (type bytes),
+      @n      decimals, temp_adc, concentration, temp and compensated (0.0 for unknown gases and
+      @n      temperatures outside the compensated range, as temp_compensation())
+    '''
+    import numpy as np
+    mask = self.valid()
+    if address is not None:
+      mask &= self.records["address"] == address
+    records = self.records[mask]
+    frames = records["frame"].astype(np.uint16)
+    raw = (frames[:, 2] << 8) | frames[:, 3]
+    decimals = frames[:, 5]
+    temp_adc = (frames[:, 6] << 8) | frames[:, 7]
+    scale = np.array([1.0, 0.1, 0.01, np.nan])[np.minimum(decimals, 3)]
+    table = np.asarray(TEMP_TABLE)
+    temp = np.where(temp_adc < len(table), table[np.minimum(temp_adc, len(table) - 1)], np.nan)
+    concentration = raw * scale
+    gastype = frames[:, 4]
+    known = np.isin(gastype, list(GAS_TYPE_CODES))
+    compensated = np.zeros(len(records))
+    if known.any():
+      compensated[known] = temp_compensation_batch(concentration[known], temp[known], gastype[known])
+    return {
+      "timestamp":     np.asarray(records["timestamp"]),
+      "address":       np.asarray(records["address"]),
+      "raw":           raw,
+      "gastype":       gastype.astype(np.uint8),
+      "decimals":      decimals.astype(np.uint8),
+      "temp_adc":      temp_adc,
+      "concentration": concentration,
+      "temp":          temp,
+      "compensated":   compensated,
+    }
+
+  def replay(self, sensor, address=None):
+    '''!
+      @brief Feed the valid CMD_GET_ALL_DTTA (0x88) frames through a sensor object, one at a time,
+      @n     to reproduce the readings with its current settings (set_temp_compensation(), ...).
+      @param sensor  DFRobot_MultiGasSensor instance, no request is sent to the device
+      @param address Only replay the frames of this sensor address, None for all
+      @return Generator of DFRobot_GasReading objects, timestamp is the recorded one
+    '''
+    mask = self.valid()
+    if address is not None:
+      mask &= self.records["address"] == address
+    for record in self.records[mask]:
+      yield sensor.analysis_reading(bytearray(record["frame"]), float(record["timestamp"]))
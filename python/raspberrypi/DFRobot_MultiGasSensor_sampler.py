@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_sampler.py
+  @note Background sampling keeping the latest reading of a sensor fresh
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import threading
+import time
+
+
+class DFRobot_Sampler(object):
+  '''!
+    @brief Reads a sensor with read_all() at a fixed interval on a background thread.
+    @details Each reading becomes the sensor's latest reading, so any number of consumers can call
+    @n       read_gas_concentration(max_age=...) or read_temp(max_age=...) and get the cached value
+    @n       without a bus transaction, as long as max_age is longer than the interval.
+    @n       The sensor must be in PASSIVITY mode.
+  '''
+  def __init__(self, sensor, interval=1.0):
+    '''!
+      @param sensor   DFRobot_MultiGasSensor_I2C or DFRobot_MultiGasSensor_UART instance
+      @param interval Seconds between two samples
+    '''
+    self.sensor = sensor
+    self.interval = interval
+    self.samples = 0    # Valid readings taken.
+    self.failures = 0   # Samples without a valid response.
+    self.errors = 0     # Exceptions raised by the transport.
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def start(self):
+    '''!
+      @brief Start the sampling thread, the first sample is taken immediately
+      @return self
+    '''
+    if self.__thread is None:
+      self.__stop.clear()
+      self.__thread = threading.Thread(target=self.__run, name="DFRobot_Sampler")
+      self.__thread.daemon = True
+      self.__thread.start()
+    return self
+
+  def stop(self):
+    '''!
+      @brief Stop the sampling thread and wait for it to exit
+    '''
+    self.__stop.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def running(self):
+    return self.__thread is not None and not self.__stop.is_set()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def latest(self, max_age=None):
+    '''!
+      @brief The latest reading of the sensor
+      @param max_age Largest age in seconds, None to accept any age
+      @return DFRobot_GasReading, None if there is none or it is older than max_age
+    '''
+    if max_age is None:
+      return self.sensor.latest
+    return self.sensor.fresh_reading(max_age)
+
+  def __run(self):
+    deadline = time.time()
+    while not self.__stop.is_set():
+      try:
+        if self.sensor.read_all() is None:
+          self.failures += 1
+        else:
+          self.samples += 1
+      except EnvironmentError:
+        self.errors += 1
+      # Keep the schedule, after a slow transaction sample at once instead of catching up.
+      deadline += self.interval
+      now = time.time()
+      if deadline < now:
+        deadline = now
+      self.__stop.wait(deadline - now)
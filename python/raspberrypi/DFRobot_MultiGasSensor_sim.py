@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_sim.py
+  @note In-process simulator of the gas probes, to run the library without a Raspberry Pi
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import bisect
+import errno
+import random
+import threading
+import time
+
+from DFRobot_MultiGasSensor import TEMP_TABLE
+from DFRobot_MultiGasSensor_codec import (
+  CMD_CHANGE_GET_METHOD, CMD_GET_GAS_CONCENTRATION, CMD_GET_TEMP, CMD_GET_ALL_DTTA,
+  CMD_SET_THRESHOLD_ALARMS, CMD_IIC_AVAILABLE, CMD_SENSOR_VOLTAGE, CMD_CHANGE_IIC_ADDR,
+  FRAME_HEAD, FRAME_LENGTH, INITIATIVE, PASSIVITY, check_sum, is_valid)
+
+## Faults accepted by DFRobot_SimulatedProbe.inject().
+FAULT_CHECKSUM = "checksum"  # The response carries a wrong check value.
+FAULT_DROP     = "drop"      # The request is not answered.
+FAULT_IO_ERROR = "io_error"  # The transfer fails with an IOError.
+FAULT_GARBAGE  = "garbage"   # Random bytes are sent before the response (UART only).
+
+# TEMP_TABLE falls with the ADC value, search it in ascending order.
+_TEMPS_ASCENDING = [TEMP_TABLE[adc] for adc in range(1023, 0, -1)]
+
+
+def temp_to_adc(temp):
+  '''!
+    @brief Inverse of adc_to_temp()
+    @param temp Board temperature, unit °C
+    @return ADC value whose temperature is the closest to temp
+  '''
+  i = bisect.bisect_left(_TEMPS_ASCENDING, temp)
+  if i == len(_TEMPS_ASCENDING):
+    i -= 1
+  elif i > 0 and temp - _TEMPS_ASCENDING[i-1] < _TEMPS_ASCENDING[i] - temp:
+    i -= 1
+  return 1023 - i
+
+
+class DFRobot_SimulatedProbe(object):
+  '''!
+    @brief Model of one gas probe answering the full command set.
+    @details The probe answers requests after a configurable latency, adds gaussian noise to the
+    @n       concentration and the temperature, and injects faults either at random rates or on
+    @n       request with inject(). In INITIATIVE mode it pushes a CMD_GET_ALL_DTTA (0x88) frame
+    @n       every report_interval seconds on UART. Time is read from the clock function, no
+    @n       thread is started.
+  '''
+  def __init__(self, gastype=0x04, concentration=0.0, decimals=0, temp=25.0, voltage=0.0,
+               latency=0.01, noise=0.0, temp_noise=0.0, mode=PASSIVITY, report_interval=1.0,
+               checksum_error_rate=0.0, drop_rate=0.0, io_error_rate=0.0, seed=None, clock=None):
+    '''!
+      @param gastype         Gas type byte reported by the probe, see DFRobot_MultiGasSensor.CO etc.
+      @param concentration   Concentration in the units of the gas
+      @param decimals        Resolution, 0: 1, 1: 0.1, 2: 0.01
+      @param temp            Board temperature, unit °C
+      @param voltage         Voltage reported by CMD_SENSOR_VOLTAGE (0x91), unit V
+      @param latency         Seconds between a request and its response
+      @param noise           Standard deviation of the concentration noise, in the units of the gas
+      @param temp_noise      Standard deviation of the temperature noise, unit °C
+      @param mode            INITIATIVE or PASSIVITY
+      @param report_interval Seconds between the frames pushed in INITIATIVE mode
+      @param checksum_error_rate Probability of a response with a wrong check value
+      @param drop_rate       Probability of a request not being answered
+      @param io_error_rate   Probability of a transfer failing with an IOError
+      @param seed            Seed of the random generator, for reproducible noise and faults
+      @param clock           Function returning the time in seconds, time.time by default
+    '''
+    self.gastype = gastype
+    self.concentration = concentration
+    self.decimals = decimals
+    self.temp = temp
+    self.voltage = voltage
+    self.latency = latency
+    self.noise = noise
+    self.temp_noise = temp_noise
+    self.mode = mode
+    self.report_interval = report_interval
+    self.checksum_error_rate = checksum_error_rate
+    self.drop_rate = drop_rate
+    self.io_error_rate = io_error_rate
+    self.clock = clock or time.time
+    self.random = random.Random(seed)
+    self.alarm_switch = 0
+    self.threshold = 0
+    self.group = None           # Set by CMD_CHANGE_IIC_ADDR (0x92), applied on power cycle.
+    self.requests = 0           # Requests received with a valid check value.
+    self.bad_requests = 0       # Requests received with a wrong check value.
+    self.__faults = []
+    self.__next_report = None
+
+  def inject(self, fault, count=1):
+    '''!
+      @brief Apply a fault to the next requests, before the random faults
+      @param fault FAULT_CHECKSUM, FAULT_DROP, FAULT_IO_ERROR or FAULT_GARBAGE
+      @param count Number of requests affected
+    '''
+    self.__faults.extend([fault] * count)
+
+  def next_fault(self):
+    '''!
+      @brief Draw the fault of the next request
+      @return One of the FAULT_* values, or None
+    '''
+    if self.__faults:
+      return self.__faults.pop(0)
+    if self.io_error_rate and self.random.random() < self.io_error_rate:
+      return FAULT_IO_ERROR
+    if self.drop_rate and self.random.random() < self.drop_rate:
+      return FAULT_DROP
+    if self.checksum_error_rate and self.random.random() < self.checksum_error_rate:
+      return FAULT_CHECKSUM
+    return None
+
+  def raw_concentration(self):
+    '''!
+      @brief Current concentration as the 16-bit value sent by the probe, noise included
+    '''
+    value = self.concentration
+    if self.noise:
+      value += self.random.gauss(0.0, self.noise)
+    raw = int(round(value * 10 ** self.decimals))
+    return min(max(raw, 0), 0xffff)
+
+  def temp_adc(self):
+    '''!
+      @brief Current temperature as the 10-bit ADC value sent by the probe, noise included
+    '''
+    temp = self.temp
+    if self.temp_noise:
+      temp += self.random.gauss(0.0, self.temp_noise)
+    return temp_to_adc(temp)
+
+  def alarm(self):
+    '''!
+      @brief Whether the threshold alarm is raised, as the ALA pin of the probe
+    '''
+    return self.alarm_switch == 1 and self.raw_concentration() > self.threshold
+
+  def __frame(self, cmd, b2=0, b3=0, b4=0, b5=0, b6=0, b7=0):
+    frame = bytearray((FRAME_HEAD, cmd, b2 & 0xff, b3 & 0xff, b4 & 0xff, b5 & 0xff, b6 & 0xff, b7 & 0xff, 0))
+    frame[8] = check_sum(frame)
+    return frame
+
+  def all_data_frame(self):
+    '''!
+      @brief CMD_GET_ALL_DTTA (0x88) frame with the current values, also pushed in INITIATIVE mode
+    '''
+    raw = self.raw_concentration()
+    adc = self.temp_adc()
+    return self.__frame(CMD_GET_ALL_DTTA, raw >> 8, raw, self.gastype, self.decimals, adc >> 8, adc)
+
+  def handle(self, request):
+    '''!
+      @brief Process a request frame
+      @param request 9-byte request frame
+      @return Response frame as bytearray, None if the request is not answered
+    '''
+    request = bytearray(request)
+    if len(request) != FRAME_LENGTH or not is_valid(request):
+      self.bad_requests += 1
+      return None
+    self.requests += 1
+    cmd = request[2]
+    if cmd == CMD_CHANGE_GET_METHOD:
+      ok = request[3] in (INITIATIVE, PASSIVITY)
+      if ok and request[3] != self.mode:
+        self.mode = request[3]
+        self.__next_report = None
+      return self.__frame(cmd, 1 if ok else 0)
+    if cmd == CMD_GET_GAS_CONCENTRATION:
+      raw = self.raw_concentration()
+      return self.__frame(cmd, raw >> 8, raw, self.gastype, self.decimals)
+    if cmd == CMD_GET_TEMP:
+      adc = self.temp_adc()
+      return self.__frame(cmd, adc >> 8, adc)
+    if cmd == CMD_GET_ALL_DTTA:
+      return self.all_data_frame()
+    if cmd == CMD_SET_THRESHOLD_ALARMS:
+      self.alarm_switch = request[3]
+      self.threshold = (request[4] << 8) | request[5]
+      return self.__frame(cmd, 1)
+    if cmd == CMD_IIC_AVAILABLE:
+      return self.__frame(cmd, 1)
+    if cmd == CMD_SENSOR_VOLTAGE:
+      adc = min(max(int(round(self.voltage / 2 / 3.0 * 1024)), 0), 1023)
+      return self.__frame(cmd, adc >> 8, adc)
+    if cmd == CMD_CHANGE_IIC_ADDR:
+      ok = 1 <= request[3] <= 8
+      if ok:
+        self.group = request[3]
+      return self.__frame(cmd, 1 if ok else 0)
+    return None
+
+  def reports(self, now):
+    '''!
+      @brief Frames pushed in INITIATIVE mode since the last call
+      @param now Current time, from the clock function
+      @return List of (time, frame) tuples
+    '''
+    if self.mode != INITIATIVE:
+      return []
+    if self.__next_report is None:
+      self.__next_report = now + self.report_interval
+      return []
+    frames = []
+    while self.__next_report <= now:
+      frames.append((self.__next_report, self.all_data_frame()))
+      self.__next_report += self.report_interval
+    return frames
+
+  def corrupt(self, frame):
+    '''!
+      @brief Make the check value of a response wrong
+    '''
+    frame[8] = (frame[8] + 1 + self.random.randrange(0xff)) & 0xff
+    return frame
+
+
+def _io_error():
+  return IOError(getattr(errno, "EREMOTEIO", 121), "Remote I/O error")
+
+
+class DFRobot_SimulatedI2CBus(object):
+  '''!
+    @brief Simulated I2C bus, a drop-in transport for DFRobot_MultiGasSensor_I2C.
+    @details Implements write_i2c_block_data() and read_i2c_block_data() of smbus.SMBus. A read
+    @n       before the response latency has elapsed returns an all-zero frame, as a probe that
+    @n       has not finished processing. Addresses without a probe raise IOError. A probe moves
+    @n       to the address group set with CMD_CHANGE_IIC_ADDR (0x92) on power_cycle().
+  '''
+  def __init__(self, probes=None):
+    '''!
+      @param probes dict of I2C address: DFRobot_SimulatedProbe
+    '''
+    self.probes = dict(probes or {})
+    self.transfers = 0          # Calls of write_i2c_block_data() and read_i2c_block_data().
+    self.__lock = threading.Lock()
+    self.__pending = {}         # I2C address: (ready time, response frame)
+
+  def add(self, addr, probe):
+    '''!
+      @brief Connect a probe to the bus
+      @param addr  I2C address, 0x60~0x7F
+      @param probe DFRobot_SimulatedProbe
+    '''
+    self.probes[addr] = probe
+
+  def write_i2c_block_data(self, addr, reg, data):
+    with self.__lock:
+      self.transfers += 1
+      probe = self.probes.get(addr)
+      if probe is None:
+        raise _io_error()
+      fault = probe.next_fault()
+      if fault == FAULT_IO_ERROR:
+        raise _io_error()
+      response = probe.handle(data)
+      if response is None or fault == FAULT_DROP:
+        self.__pending.pop(addr, None)
+        return
+      if fault == FAULT_CHECKSUM:
+        probe.corrupt(response)
+      self.__pending[addr] = (probe.clock() + probe.latency, response)
+
+  def power_cycle(self):
+    '''!
+      @brief Restart the probes, the address groups set with CMD_CHANGE_IIC_ADDR (0x92) take effect
+    '''
+    with self.__lock:
+      self.__pending.clear()
+      probes = {}
+      for addr, probe in self.probes.items():
+        if probe.group is not None:
+          addr = 0x60 + ((probe.group - 1) << 2) + (addr & 0x03)
+          probe.group = None
+        probes[addr] = probe
+      self.probes = probes
+
+  def read_i2c_block_data(self, addr, reg, length):
+    with self.__lock:
+      self.transfers += 1
+      probe = self.probes.get(addr)
+      if probe is None:
+        raise _io_error()
+      pending = self.__pending.get(addr)
+      if pending is None or probe.clock() < pending[0]:
+        return [0] * length
+      del self.__pending[addr]
+      return list(pending[1][:length]) + [0] * (length - FRAME_LENGTH)
+
+
+class DFRobot_SimulatedSerial(object):
+  '''!
+    @brief Simulated serial port with one probe, a drop-in transport for DFRobot_MultiGasSensor_UART.
+    @details Implements the parts of serial.Serial used by the library. Responses and the frames
+    @n       pushed in INITIATIVE mode become readable when their time has come. read() waits up
+    @n       to timeout seconds for the requested bytes, as pyserial does.
+  '''
+  def __init__(self, probe, timeout=None):
+    '''!
+      @param probe   DFRobot_SimulatedProbe
+      @param timeout Read timeout in seconds, None to wait until the bytes arrive
+    '''
+    self.probe = probe
+    self.timeout = timeout
+    self.written = 0            # Bytes written to the port.
+    self.__lock = threading.Lock()
+    self.__rx = bytearray()     # Bytes that have arrived.
+    self.__pending = []         # (time, frame) not arrived yet, in time order.
+
+  def isOpen(self):
+    return True
+
+  def open(self):
+    pass
+
+  def close(self):
+    pass
+
+  def write(self, data):
+    data = bytearray(data)
+    with self.__lock:
+      self.written += len(data)
+      self.__update()
+      probe = self.probe
+      for i in range(0, len(data) - FRAME_LENGTH + 1, FRAME_LENGTH):
+        fault = probe.next_fault()
+        if fault == FAULT_IO_ERROR:
+          raise _io_error()
+        response = probe.handle(data[i:i + FRAME_LENGTH])
+        if response is None or fault == FAULT_DROP:
+          continue
+        if fault == FAULT_CHECKSUM:
+          probe.corrupt(response)
+        elif fault == FAULT_GARBAGE:
+          response = bytearray(probe.random.randrange(0x100) for _ in range(4)) + response
+        bisect.insort(self.__pending, (probe.clock() + probe.latency, len(self.__pending), response))
+    return len(data)
+
+  def __update(self):
+    now = self.probe.clock()
+    for t, frame in self.probe.reports(now):
+      bisect.insort(self.__pending, (t, len(self.__pending), frame))
+    arrived = 0
+    while arrived < len(self.__pending) and self.__pending[arrived][0] <= now:
+      self.__rx += self.__pending[arrived][2]
+      arrived += 1
+    del self.__pending[:arrived]
+    return now
+
+  def inWaiting(self):
+    with self.__lock:
+      self.__update()
+      return len(self.__rx)
+
+  @property
+  def in_waiting(self):
+    return self.inWaiting()
+
+  def read(self, size=1):
+    deadline = None if self.timeout is None else self.probe.clock() + self.timeout
+    while True:
+      with self.__lock:
+        now = self.__update()
+        if len(self.__rx) >= size or (deadline is not None and now >= deadline):
+          data = bytes(self.__rx[:size])
+          del self.__rx[:size]
+          return data
+        wake = deadline
+        if self.__pending and (wake is None or self.__pending[0][0] < wake):
+          wake = self.__pending[0][0]
+        if self.probe.mode == INITIATIVE:
+          wake = now + self.probe.report_interval if wake is None else min(wake, now + self.probe.report_interval)
+      time.sleep(max(wake - now, 0) if wake is not None else 0.01)
+
+  def flushInput(self):
+    with self.__lock:
+      self.__update()
+      del self.__rx[:]
+
+  reset_input_buffer = flushInput
+
+
+class DFRobot_SimulatedGPIO(object):
+  '''!
+    @brief Simulated GPIO inputs, a drop-in for DFRobot_RPiGPIO of DFRobot_MultiGasSensor_alarm.
+    @details Levels are set with set(), or follow the ALA output of the probes connected with
+    @n       connect() on every update(). Edge callbacks run on the thread changing the level.
+  '''
+  def __init__(self):
+    self.levels = {}            # pin: 0 or 1
+    self.probes = {}            # pin: DFRobot_SimulatedProbe driving it
+    self.__callbacks = {}
+    self.__lock = threading.Lock()
+
+  def connect(self, pin, probe):
+    '''!
+      @brief Drive a pin with the ALA output of a probe, high while its alarm is raised
+    '''
+    self.probes[pin] = probe
+
+  def update(self):
+    '''!
+      @brief Set every connected pin to the alarm state of its probe
+    '''
+    for pin, probe in list(self.probes.items()):
+      self.set(pin, 1 if probe.alarm() else 0)
+
+  def set(self, pin, level):
+    '''!
+      @brief Change the level of a pin, the callback of the pin is called if it changed
+    '''
+    with self.__lock:
+      changed = self.levels.get(pin, 0) != level
+      self.levels[pin] = level
+      callback = self.__callbacks.get(pin)
+    if changed and callback is not None:
+      callback(pin, level)
+
+  def watch(self, pin, callback, bouncetime=0):
+    with self.__lock:
+      self.__callbacks[pin] = callback
+
+  def unwatch(self, pin):
+    with self.__lock:
+      self.__callbacks.pop(pin, None)
+
+  def input(self, pin):
+    return self.levels.get(pin, 0)
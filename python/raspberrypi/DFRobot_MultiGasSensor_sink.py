@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_sink.py
+  @note Batched storage of readings to SQLite, CSV or a columnar chunk file on a writer thread
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import array
+import csv
+import json
+import os
+import struct
+import threading
+import time
+
+from DFRobot_MultiGasSensor_stream import DFRobot_RingBuffer, DROP_OLDEST
+
+## Fields of a stored reading, in column order.
+ROW_FIELDS = ("timestamp", "sensor", "gastype", "concentration", "gasconcentration", "units", "temp")
+
+
+class DFRobot_BatchSink(object):
+  '''!
+    @brief Base class of the sinks: readings are queued by put() and written in batches by a
+    @n     writer thread, so the thread taking the readings never waits for the disk.
+    @details A batch is written when it holds batch_size readings or when its oldest reading is
+    @n       flush_interval seconds old. When the queue is full the oldest readings are dropped
+    @n       (policy DROP_OLDEST, counted in overruns) or put() waits (BLOCK). Attach a sink to a
+    @n       sensor with DFRobot_MultiGasSensor.set_sink(), or call put() from a stream callback.
+    @n       Subclasses implement open_writer(), write_rows() and close_writer(), which are only
+    @n       called on the writer thread.
+  '''
+  def __init__(self, batch_size=500, flush_interval=5.0, queue_size=10000, policy=DROP_OLDEST):
+    '''!
+      @param batch_size     Largest number of readings written at once
+      @param flush_interval Longest time in seconds a reading waits in the queue
+      @param queue_size     Number of readings the queue holds
+      @param policy         DROP_OLDEST or BLOCK, what happens when the queue is full
+    '''
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.queue = DFRobot_RingBuffer(queue_size, policy)
+    self.written = 0    # Readings written.
+    self.batches = 0    # Batches written.
+    self.errors = 0     # Batches lost to an exception of write_rows().
+    self.last_error = None
+    self.__stop = threading.Event()
+    self.__cond = threading.Condition()
+    self.__requested = 0   # flush() calls.
+    self.__flushed = 0     # flush() calls served.
+    self.__thread = threading.Thread(target=self.__run, name=type(self).__name__)
+    self.__thread.daemon = True
+    self.__opened = threading.Event()
+    self.__open_error = None
+    self.__thread.start()
+    self.__opened.wait()
+    if self.__open_error is not None:
+      self.__thread.join()
+      raise self.__open_error
+
+  def open_writer(self):
+    '''!
+      @brief Open the storage, on the writer thread
+    '''
+    pass
+
+  def write_rows(self, rows):
+    '''!
+      @brief Write a batch, on the writer thread
+      @param rows List of tuples of the ROW_FIELDS values
+    '''
+    raise NotImplementedError
+
+  def close_writer(self):
+    '''!
+      @brief Close the storage, on the writer thread
+    '''
+    pass
+
+  def put(self, reading, sensor=""):
+    '''!
+      @brief Queue a reading
+      @param reading DFRobot_GasReading
+      @param sensor  Name of the sensor stored with the reading
+    '''
+    self.queue.put((sensor, reading), self.__stop.is_set)
+
+  def flush(self, timeout=None):
+    '''!
+      @brief Write the queued readings now and wait until they are written
+      @param timeout Seconds to wait, None to wait until done
+      @return True if the readings were written in time
+    '''
+    deadline = None if timeout is None else time.time() + timeout
+    with self.__cond:
+      self.__requested += 1
+      target = self.__requested
+    self.queue.wake()
+    with self.__cond:
+      while self.__flushed < target and self.__thread.is_alive():
+        remaining = 0.1 if deadline is None else min(0.1, deadline - time.time())
+        if remaining <= 0:
+          return False
+        self.__cond.wait(remaining)
+      return self.__flushed >= target
+
+  def close(self):
+    '''!
+      @brief Write the queued readings, stop the writer thread and close the storage
+    '''
+    self.__stop.set()
+    self.queue.wake()
+    self.__thread.join()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def stats(self):
+    '''!
+      @brief Counters of the sink
+      @return dict of received, overruns, queued, written, batches and errors
+    '''
+    return {
+      "received": self.queue.received,
+      "overruns": self.queue.overruns,
+      "queued":   len(self.queue),
+      "written":  self.written,
+      "batches":  self.batches,
+      "errors":   self.errors,
+    }
+
+  def __write(self, batch):
+    rows = [(reading.timestamp, sensor, reading.gastype, reading.concentration, reading.gasconcentration,
+             reading.gasunits, reading.temp) for sensor, reading in batch]
+    try:
+      self.write_rows(rows)
+      self.written += len(rows)
+      self.batches += 1
+    except Exception as e:
+      self.errors += 1
+      self.last_error = e
+
+  def __run(self):
+    try:
+      self.open_writer()
+    except Exception as e:
+      self.__open_error = e
+      self.__opened.set()
+      return
+    self.__opened.set()
+    batch = []
+    oldest = None
+    try:
+      while True:
+        stopping = self.__stop.is_set()
+        with self.__cond:
+          requested = self.__requested
+        if stopping or requested > self.__flushed:
+          # Take everything queued, written below in batches of batch_size.
+          item = self.queue.get(0)
+          while item is not None:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+              self.__write(batch)
+              batch = []
+            item = self.queue.get(0)
+          if batch:
+            self.__write(batch)
+          batch = []
+          oldest = None
+          with self.__cond:
+            self.__flushed = requested
+            self.__cond.notify_all()
+          if stopping:
+            return
+          continue
+        wait = 0.1 if oldest is None else min(0.1, max(oldest + self.flush_interval - time.time(), 0))
+        item = self.queue.get(wait)
+        if item is not None:
+          if oldest is None:
+            oldest = time.time()
+          batch.append(item)
+        if batch and (len(batch) >= self.batch_size or time.time() - oldest >= self.flush_interval):
+          self.__write(batch)
+          batch = []
+          oldest = None
+    finally:
+      self.close_writer()
+
+
+class DFRobot_SQLiteSink(DFRobot_BatchSink):
+  '''!
+    @brief Stores readings in an SQLite table, one executemany() in one transaction per batch
+  '''
+  def __init__(self, path, table="readings", wal=True, **kwargs):
+    '''!
+      @param path   Database file
+      @param table  Table name, created if it does not exist
+      @param wal    Use write-ahead logging, which writes less on commit
+      @param kwargs batch_size, flush_interval, queue_size and policy of DFRobot_BatchSink
+    '''
+    self.path = path
+    self.table = table
+    self.wal = wal
+    super(DFRobot_SQLiteSink, self).__init__(**kwargs)
+
+  def open_writer(self):
+    import sqlite3
+    self.db = sqlite3.connect(self.path)
+    if self.wal:
+      self.db.execute("PRAGMA journal_mode=WAL")
+    self.db.execute('CREATE TABLE IF NOT EXISTS "%s" (timestamp REAL, sensor TEXT, gastype TEXT, '
+                    'concentration REAL, gasconcentration REAL, units TEXT, temp REAL)' % self.table)
+    self.db.commit()
+    self.insert = 'INSERT INTO "%s" VALUES (?, ?, ?, ?, ?, ?, ?)' % self.table
+
+  def write_rows(self, rows):
+    with self.db:
+      self.db.executemany(self.insert, rows)
+
+  def close_writer(self):
+    self.db.close()
+
+
+class DFRobot_CSVSink(DFRobot_BatchSink):
+  '''!
+    @brief Appends readings to a CSV file through a large buffer, handed to the system once per batch
+  '''
+  def __init__(self, path, buffering=1 << 16, **kwargs):
+    '''!
+      @param path      File to append to, a header line is written if it is new
+      @param buffering Size of the file buffer in bytes
+      @param kwargs    batch_size, flush_interval, queue_size and policy of DFRobot_BatchSink
+    '''
+    self.path = path
+    self.buffering = buffering
+    super(DFRobot_CSVSink, self).__init__(**kwargs)
+
+  def open_writer(self):
+    new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+    self.file = open(self.path, "a", buffering=self.buffering)
+    self.writer = csv.writer(self.file)
+    if new:
+      self.writer.writerow(ROW_FIELDS)
+
+  def write_rows(self, rows):
+    self.writer.writerows(rows)
+    self.file.flush()
+
+  def close_writer(self):
+    self.file.close()
+
+
+# | magic (8) | rows (uint32) | length of the sensor names (uint32) | sensor names, JSON list | columns |
+CHUNK_MAGIC = b"DFRMGC01"
+_CHUNK_HEADER = struct.Struct("<8sII")
+## Columns of a chunk: name -> array.array typecode, stored little-endian in this order.
+## sensor is an index into the sensor names of the chunk, gastype into those of the chunk too.
+CHUNK_COLUMNS = (
+  ("timestamp",        "d"),
+  ("sensor",           "H"),
+  ("gastype",          "H"),
+  ("concentration",    "d"),
+  ("gasconcentration", "d"),
+  ("temp",             "d"),
+)
+
+## Bytes of one row over all the columns of a chunk.
+_ROW_SIZE = sum(array.array(typecode).itemsize for _, typecode in CHUNK_COLUMNS)
+
+def _little_endian(column):
+  if struct.pack("=H", 1) != struct.pack("<H", 1):
+    column.byteswap()
+  return column
+
+
+class DFRobot_ColumnarSink(DFRobot_BatchSink):
+  '''!
+    @brief Appends readings to a file of columnar chunks, one chunk per batch, read back with
+    @n     read_chunks(). Each column of a chunk is one contiguous array.
+  '''
+  def __init__(self, path, **kwargs):
+    '''!
+      @param path   File to append to
+      @param kwargs batch_size, flush_interval, queue_size and policy of DFRobot_BatchSink
+    '''
+    self.path = path
+    super(DFRobot_ColumnarSink, self).__init__(**kwargs)
+
+  def open_writer(self):
+    size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+    end = _chunks_end(self.path, size) if size else 0
+    self.file = open(self.path, "ab")
+    if end < size:
+      # Drop a chunk cut short by a crash so the following ones stay readable.
+      self.file.truncate(end)
+
+  def write_rows(self, rows):
+    names = {}
+    sensors = array.array("H", [names.setdefault(row[1], len(names)) for row in rows])
+    sensor_names = sorted(names, key=names.get)
+    types = {}
+    gastypes = array.array("H", [types.setdefault(row[2], len(types)) for row in rows])
+    gastype_names = sorted(types, key=types.get)
+    columns = {
+      "timestamp":        array.array("d", [row[0] for row in rows]),
+      "sensor":           sensors,
+      "gastype":          gastypes,
+      "concentration":    array.array("d", [row[3] for row in rows]),
+      "gasconcentration": array.array("d", [row[4] for row in rows]),
+      "temp":             array.array("d", [row[6] for row in rows]),
+    }
+    names = json.dumps({"sensor": sensor_names, "gastype": gastype_names}).encode("utf-8")
+    data = [_CHUNK_HEADER.pack(CHUNK_MAGIC, len(rows), len(names)), names]
+    for name, _ in CHUNK_COLUMNS:
+      data.append(_little_endian(columns[name]).tobytes())
+    # One write per chunk, a crash loses at most the chunk being written: open_writer() drops what
+    # is left of it.
+    self.file.write(b"".join(data))
+    self.file.flush()
+
+  def close_writer(self):
+    self.file.close()
+
+
+def _chunks_end(path, size):
+  # Offset of the end of the last complete chunk, found from the chunk headers.
+  end = 0
+  with open(path, "rb") as f:
+    while True:
+      header = f.read(_CHUNK_HEADER.size)
+      if len(header) < _CHUNK_HEADER.size:
+        return end
+      magic, rows, length = _CHUNK_HEADER.unpack(header)
+      if magic != CHUNK_MAGIC:
+        raise ValueError("%s: not a columnar chunk file" % path)
+      chunk_end = end + _CHUNK_HEADER.size + length + rows * _ROW_SIZE
+      if chunk_end > size:
+        return end
+      end = chunk_end
+      f.seek(end)
+
+
+def read_chunks(path):
+  '''!
+    @brief Read the chunks written by DFRobot_ColumnarSink
+    @param path File to read
+    @return Generator of dicts of column name: array.array, sensor and gastype decoded to lists of
+    @n      names. A chunk cut short at the end of the file is ignored.
+    @exception ValueError The file holds something else than chunks
+  '''
+  with open(path, "rb") as f:
+    while True:
+      header = f.read(_CHUNK_HEADER.size)
+      if len(header) < _CHUNK_HEADER.size:
+        return
+      magic, rows, length = _CHUNK_HEADER.unpack(header)
+      if magic != CHUNK_MAGIC:
+        raise ValueError("%s: not a columnar chunk file" % path)
+      names = f.read(length)
+      chunk = {}
+      for name, typecode in CHUNK_COLUMNS:
+        column = array.array(typecode)
+        size = rows * column.itemsize
+        data = f.read(size)
+        if len(data) < size or len(names) < length:
+          return
+        column.frombytes(data)
+        chunk[name] = _little_endian(column)
+      names = json.loads(names.decode("utf-8"))
+      chunk["sensor"] = [names["sensor"][i] for i in chunk["sensor"]]
+      chunk["gastype"] = [names["gastype"][i] for i in chunk["gastype"]]
+      yield chunk
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_stream.py
+  @note Background capture of the readings pushed by sensors in INITIATIVE mode
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import collections
+import threading
+import time
+
+from DFRobot_MultiGasSensor import DFRobot_MultiGasSensor_UART
+from DFRobot_MultiGasSensor_codec import CMD_GET_ALL_DTTA
+
+## Policies of DFRobot_RingBuffer when it is full.
+DROP_OLDEST = "drop_oldest"  # Discard the oldest item and count an overrun.
+BLOCK       = "block"        # Wait until a consumer makes room.
+
+
+class DFRobot_RingBuffer(object):
+  '''!
+    @brief Bounded thread-safe FIFO between one producer and its consumers
+  '''
+  def __init__(self, size, policy=DROP_OLDEST):
+    '''!
+      @param size   Maximum number of items
+      @param policy DROP_OLDEST or BLOCK
+    '''
+    if policy not in (DROP_OLDEST, BLOCK):
+      raise ValueError("unknown policy %r" % (policy,))
+    self.size = size
+    self.policy = policy
+    self.items = collections.deque()
+    self.received = 0   # Items put.
+    self.overruns = 0   # Items discarded by DROP_OLDEST.
+    self.blocked = 0    # Puts that had to wait with BLOCK.
+    self.__cond = threading.Condition()
+
+  def __len__(self):
+    return len(self.items)
+
+  def put(self, item, stopped=lambda: False):
+    '''!
+      @brief Append an item
+      @param item    Item to append
+      @param stopped Function returning True when a BLOCK put should give up waiting
+      @return False if the item was not appended because stopped() became true
+    '''
+    with self.__cond:
+      self.received += 1
+      if len(self.items) >= self.size:
+        if self.policy == DROP_OLDEST:
+          self.items.popleft()
+          self.overruns += 1
+        else:
+          self.blocked += 1
+          while len(self.items) >= self.size:
+            if stopped():
+              return False
+            self.__cond.wait(0.1)
+      self.items.append(item)
+      self.__cond.notify_all()
+      return True
+
+  def get(self, timeout=None):
+    '''!
+      @brief Remove the oldest item
+      @param timeout Seconds to wait for an item, None to wait forever
+      @return The item, None if the timeout expired
+    '''
+    deadline = None if timeout is None else time.time() + timeout
+    with self.__cond:
+      while not self.items:
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+          return None
+        self.__cond.wait(remaining)
+      item = self.items.popleft()
+      self.__cond.notify_all()
+      return item
+
+  def wake(self):
+    '''!
+      @brief Wake the threads waiting in put() and get() so they can check their stop condition
+    '''
+    with self.__cond:
+      self.__cond.notify_all()
+
+
+class DFRobot_ReadingStream(object):
+  '''!
+    @brief Captures the readings of a sensor in INITIATIVE mode with a background thread.
+    @details On UART the thread blocks on the serial port and parses every pushed frame as it
+    @n       arrives. I2C has no push, the thread requests CMD_GET_ALL_DTTA (0x88) every interval
+    @n       seconds instead. The readings go to the callback if one is given, otherwise to a
+    @n       bounded DFRobot_RingBuffer read by get() or by iterating over the stream.
+    @n       While a UART stream runs it owns the receive side of the port, stop it before sending
+    @n       other commands.
+  '''
+  def __init__(self, sensor, size=256, policy=DROP_OLDEST, callback=None, interval=1.0, read_timeout=0.5):
+    '''!
+      @param sensor       DFRobot_MultiGasSensor_I2C or DFRobot_MultiGasSensor_UART instance
+      @param size         Number of readings the buffer holds
+      @param policy       DROP_OLDEST or BLOCK, what happens when the buffer is full
+      @param callback     Function called with each DFRobot_GasReading on the reader thread, instead of buffering
+      @param interval     Seconds between two requests on I2C
+      @param read_timeout Longest blocking serial read on UART, bounds the time stop() takes
+    '''
+    self.sensor = sensor
+    self.buffer = DFRobot_RingBuffer(size, policy)
+    self.callback = callback
+    self.interval = interval
+    self.read_timeout = read_timeout
+    self.errors = 0     # Exceptions raised by the transport or the callback.
+    self.ignored = 0    # Frames other than CMD_GET_ALL_DTTA (0x88) responses, recorded but not decoded.
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def start(self):
+    '''!
+      @brief Start the reader thread
+      @return self
+    '''
+    if self.__thread is None:
+      self.__stop.clear()
+      target = self.__read_uart if isinstance(self.sensor, DFRobot_MultiGasSensor_UART) else self.__read_i2c
+      self.__thread = threading.Thread(target=target, name="DFRobot_ReadingStream")
+      self.__thread.daemon = True
+      self.__thread.start()
+    return self
+
+  def stop(self):
+    '''!
+      @brief Stop the reader thread and wait for it to exit. Buffered readings can still be read.
+    '''
+    self.__stop.set()
+    self.buffer.wake()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def running(self):
+    return self.__thread is not None and not self.__stop.is_set()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def __emit(self, reading):
+    if self.callback is None:
+      self.buffer.put(reading, self.__stop.is_set)
+      return
+    try:
+      self.callback(reading)
+    except Exception:
+      self.errors += 1
+
+  def __read_uart(self):
+    sensor = self.sensor
+    ser = sensor.ser
+    timeout = getattr(ser, "timeout", None)
+    ser.timeout = self.read_timeout
+    try:
+      while not self.__stop.is_set():
+        try:
+          # Blocks until at least one byte arrives, then takes whatever else is waiting.
+          data = ser.read(max(ser.inWaiting(), 1))
+        except EnvironmentError:
+          self.errors += 1
+          self.__stop.wait(self.read_timeout)
+          continue
+        if not data:
+          continue
+        sensor.decoder.feed(data)
+        for frame in sensor.decoder.frames():
+          sensor.record_frame(frame)
+          if frame[1] != CMD_GET_ALL_DTTA:
+            self.ignored += 1
+            continue
+          self.__emit(sensor.analysis_reading(frame))
+    finally:
+      ser.timeout = timeout
+
+  def __read_i2c(self):
+    deadline = time.time()
+    while not self.__stop.is_set():
+      try:
+        reading = self.sensor.read_all()
+      except EnvironmentError:
+        self.errors += 1
+        reading = None
+      if reading is not None:
+        self.__emit(reading)
+      deadline = max(deadline + self.interval, time.time())
+      self.__stop.wait(deadline - time.time())
+
+  def get(self, timeout=None):
+    '''!
+      @brief Take the oldest buffered reading
+      @param timeout Seconds to wait, None to wait until a reading arrives or the stream stops
+      @return DFRobot_GasReading, None on timeout or when the stream has stopped and is empty
+    '''
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+      wait = 0.1 if deadline is None else min(0.1, deadline - time.time())
+      reading = self.buffer.get(max(wait, 0))
+      if reading is not None:
+        return reading
+      if self.__stop.is_set() or (deadline is not None and time.time() >= deadline):
+        return None
+
+  def __iter__(self):
+    while True:
+      reading = self.get()
+      if reading is None:
+        return
+      yield reading
+
+  def stats(self):
+    '''!
+      @brief Counters of the stream
+      @return dict of received, overruns, blocked, buffered, errors and ignored
+    '''
+    return {
+      "received": self.buffer.received,
+      "overruns": self.buffer.overruns,
+      "blocked":  self.buffer.blocked,
+      "buffered": len(self.buffer),
+      "errors":   self.errors,
+      "ignored":  self.ignored,
+    }
+
+
+class DFRobot_MultiPortReader(object):
+  '''!
+    @brief Captures the readings pushed by many UART sensors in INITIATIVE mode with one thread.
+    @details The serial ports are multiplexed with selectors (epoll on Linux): the thread sleeps
+    @n       until one of them is readable, then feeds what arrived to the frame decoder of that
+    @n       sensor. Transports without a file descriptor, such as DFRobot_SimulatedSerial, are
+    @n       polled every poll_interval instead. The readings go to the callback if one is given,
+    @n       otherwise to a bounded DFRobot_RingBuffer of (sensor, reading) pairs.
+    @n       While the reader runs it owns the receive side of the ports.
+  '''
+  def __init__(self, sensors, size=256, policy=DROP_OLDEST, callback=None, poll_interval=0.05):
+    '''!
+      @param sensors       DFRobot_MultiGasSensor_UART instances, one per serial port
+      @param size          Number of readings the buffer holds
+      @param policy        DROP_OLDEST or BLOCK, what happens when the buffer is full
+      @param callback      Function called with the sensor and each DFRobot_GasReading on the reader thread
+      @param poll_interval Seconds between two polls of the transports without file descriptor,
+      @n                   also bounds the time stop() takes
+    '''
+    self.sensors = list(sensors)
+    self.buffer = DFRobot_RingBuffer(size, policy)
+    self.callback = callback
+    self.poll_interval = poll_interval
+    self.frames = 0     # Frames decoded.
+    self.errors = 0     # Exceptions raised by the transports or the callback.
+    self.ignored = 0    # Frames other than CMD_GET_ALL_DTTA (0x88) responses, recorded but not decoded.
+    self.closed = []    # Sensors whose port failed, they are not read any more.
+    self.__stop = threading.Event()
+    self.__thread = None
+
+  def start(self):
+    '''!
+      @brief Start the reader thread
+      @return self
+    '''
+    if self.__thread is None:
+      self.__stop.clear()
+      self.__thread = threading.Thread(target=self.__run, name="DFRobot_MultiPortReader")
+      self.__thread.daemon = True
+      self.__thread.start()
+    return self
+
+  def stop(self):
+    '''!
+      @brief Stop the reader thread and wait for it to exit. Buffered readings can still be read.
+    '''
+    self.__stop.set()
+    self.buffer.wake()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def running(self):
+    return self.__thread is not None and not self.__stop.is_set()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def __emit(self, sensor, reading):
+    if self.callback is None:
+      self.buffer.put((sensor, reading), self.__stop.is_set)
+      return
+    try:
+      self.callback(sensor, reading)
+    except Exception:
+      self.errors += 1
+
+  def __drain(self, sensor, readable=False):
+    # Read what has arrived on the port of a sensor, False if the port failed.
+    ser = sensor.ser
+    try:
+      count = ser.inWaiting()
+      if readable:
+        # A readable port without waiting bytes is disconnected, pyserial raises on the read.
+        count = max(count, 1)
+      data = ser.read(count) if count else b""
+    except EnvironmentError:
+      self.errors += 1
+      self.closed.append(sensor)
+      return False
+    if data:
+      sensor.decoder.feed(data)
+      for frame in sensor.decoder.frames():
+        self.frames += 1
+        sensor.record_frame(frame)
+        if frame[1] != CMD_GET_ALL_DTTA:
+          self.ignored += 1
+          continue
+        self.__emit(sensor, sensor.analysis_reading(frame))
+    return True
+
+  def __run(self):
+    import selectors
+    selector = selectors.DefaultSelector()
+    polled = []
+    for sensor in self.sensors:
+      try:
+        selector.register(sensor.ser.fileno(), selectors.EVENT_READ, sensor)
+      except (AttributeError, ValueError, EnvironmentError):
+        polled.append(sensor)
+    try:
+      while not self.__stop.is_set():
+        if selector.get_map():
+          events = selector.select(self.poll_interval)
+        else:
+          self.__stop.wait(self.poll_interval)
+          events = []
+        for key, _ in events:
+          if not self.__drain(key.data, True):
+            selector.unregister(key.fd)
+        for sensor in list(polled):
+          if not self.__drain(sensor):
+            polled.remove(sensor)
+    finally:
+      selector.close()
+
+  def get(self, timeout=None):
+    '''!
+      @brief Take the oldest buffered reading
+      @param timeout Seconds to wait, None to wait until a reading arrives or the reader stops
+      @return (sensor, DFRobot_GasReading), None on timeout or when the reader has stopped and is empty
+    '''
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+      wait = 0.1 if deadline is None else min(0.1, deadline - time.time())
+      item = self.buffer.get(max(wait, 0))
+      if item is not None:
+        return item
+      if self.__stop.is_set() or (deadline is not None and time.time() >= deadline):
+        return None
+
+  def __iter__(self):
+    while True:
+      item = self.get()
+      if item is None:
+        return
+      yield item
+
+  def stats(self):
+    '''!
+      @brief Counters of the reader
+      @return dict of frames, received, overruns, blocked, buffered, errors, ignored and closed (number of failed ports)
+    '''
+    return {
+      "frames":   self.frames,
+      "received": self.buffer.received,
+      "overruns": self.buffer.overruns,
+      "blocked":  self.buffer.blocked,
+      "buffered": len(self.buffer),
+      "errors":   self.errors,
+      "ignored":  self.ignored,
+      "closed":   len(self.closed),
+    }
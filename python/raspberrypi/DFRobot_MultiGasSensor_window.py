@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*
+"""
+  @file DFRobot_MultiGasSensor_window.py
+  @note Rolling statistics of the readings of a sensor: mean, min, max, EWMA and time-weighted average
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import collections
+import math
+import threading
+
+## Windows of DFRobot_ReadingStatistics when none are given: name -> seconds.
+## "15m" is the period of a short-term exposure limit (STEL), "8h" of a time-weighted average (TWA).
+DEFAULT_WINDOWS = (("1m", 60), ("15m", 15 * 60), ("8h", 8 * 3600))
+
+# Fields of a bucket of DFRobot_RollingWindow.
+_K, _COUNT, _SUM, _INTEGRAL, _DURATION = range(5)
+
+
+class DFRobot_RollingWindow(object):
+  '''!
+    @brief Mean, min, max and time-weighted average of the samples of the last seconds, updated in
+    @n     O(1) per sample.
+    @details The window is divided into buckets of seconds / buckets: samples are summed into the
+    @n       bucket of their timestamp and whole buckets leave the window, so the memory does not
+    @n       depend on the sample rate and the window edge is exact to one bucket. The min and max
+    @n       are kept in monotonic deques of at most one entry per bucket.
+    @n       The time-weighted average holds every sample until the next one (step interpolation).
+  '''
+  def __init__(self, seconds, buckets=60):
+    '''!
+      @param seconds Length of the window
+      @param buckets Number of buckets the window is divided into
+    '''
+    if seconds <= 0 or buckets < 1:
+      raise ValueError("seconds and buckets must be positive")
+    self.seconds = seconds
+    self.width = float(seconds) / buckets
+    self.buckets = buckets
+    self.__window = collections.deque()
+    self.__min = collections.deque()   # (bucket, value), values increasing
+    self.__max = collections.deque()   # (bucket, value), values decreasing
+    self.__count = 0
+    self.__sum = 0.0
+    self.__integral = 0.0
+    self.__duration = 0.0
+    self.__last = None                 # (timestamp, value) of the newest sample
+
+  def __bucket(self, k):
+    window = self.__window
+    if not window or window[-1][_K] < k:
+      window.append([k, 0, 0.0, 0.0, 0.0])
+      self.__expire(k)
+    return window[-1]
+
+  def __expire(self, k):
+    # Drop the buckets that are out of the window when bucket k is the newest.
+    cutoff = k - self.buckets
+    window = self.__window
+    while window and window[0][_K] <= cutoff:
+      bucket = window.popleft()
+      self.__count -= bucket[_COUNT]
+      self.__sum -= bucket[_SUM]
+      self.__integral -= bucket[_INTEGRAL]
+      self.__duration -= bucket[_DURATION]
+    if not window:
+      self.__count = 0
+      self.__sum = self.__integral = self.__duration = 0.0
+    while self.__min and self.__min[0][0] <= cutoff:
+      self.__min.popleft()
+    while self.__max and self.__max[0][0] <= cutoff:
+      self.__max.popleft()
+
+  def expire(self, now):
+    '''!
+      @brief Drop the samples that are out of the window at a given time
+      @param now Timestamp, on the clock of the samples
+    '''
+    self.__expire(int(now // self.width))
+
+  def __hold(self, start, end, value):
+    # Spread value * (end - start) over the buckets the interval covers.
+    width = self.width
+    while start < end:
+      k = int(start // width)
+      stop = min(end, (k + 1) * width)
+      if stop <= start:
+        stop = min(end, start + width)
+      bucket = self.__bucket(k)
+      bucket[_INTEGRAL] += value * (stop - start)
+      bucket[_DURATION] += stop - start
+      self.__integral += value * (stop - start)
+      self.__duration += stop - start
+      start = stop
+
+  def add(self, timestamp, value):
+    '''!
+      @brief Add a sample, samples older than the newest one count as taken at its time
+      @param timestamp Time of the sample in seconds
+      @param value     Sample value, NaN is ignored
+    '''
+    if value != value:
+      return
+    last = self.__last
+    if last is not None:
+      if timestamp < last[0]:
+        timestamp = last[0]
+      self.__hold(max(last[0], timestamp - self.seconds), timestamp, last[1])
+    self.__last = (timestamp, value)
+    k = int(timestamp // self.width)
+    bucket = self.__bucket(k)
+    bucket[_COUNT] += 1
+    bucket[_SUM] += value
+    self.__count += 1
+    self.__sum += value
+    lows = self.__min
+    if not lows or lows[-1][0] != k or lows[-1][1] > value:
+      while lows and lows[-1][1] >= value:
+        lows.pop()
+      lows.append((k, value))
+    highs = self.__max
+    if not highs or highs[-1][0] != k or highs[-1][1] < value:
+      while highs and highs[-1][1] <= value:
+        highs.pop()
+      highs.append((k, value))
+
+  def count(self):
+    return self.__count
+
+  def mean(self):
+    '''!
+      @return Arithmetic mean of the samples, None if there are none
+    '''
+    return self.__sum / self.__count if self.__count else None
+
+  def min(self):
+    return self.__min[0][1] if self.__min else None
+
+  def max(self):
+    return self.__max[0][1] if self.__max else None
+
+  def twa(self, full_window=False):
+    '''!
+      @brief Time-weighted average
+      @param full_window False to divide by the time covered by samples, True to divide by the
+      @n     window length, counting the time without samples as zero exposure (8-hour TWA)
+      @return Average, None if no time is covered yet
+    '''
+    if full_window:
+      return self.__integral / self.seconds
+    return self.__integral / self.__duration if self.__duration > 0 else None
+
+  def stats(self):
+    '''!
+      @return dict of count, mean, min, max and twa
+    '''
+    return {"count": self.count(), "mean": self.mean(), "min": self.min(), "max": self.max(), "twa": self.twa()}
+
+
+class DFRobot_ReadingStatistics(object):
+  '''!
+    @brief Rolling statistics of the readings of a sensor, over several windows at once.
+    @details Attach it with DFRobot_MultiGasSensor.set_statistics(), every CMD_GET_ALL_DTTA (0x88)
+    @n       reading is then added. stats() can be called from any thread at any time.
+  '''
+  def __init__(self, windows=DEFAULT_WINDOWS, buckets=60, ewma=60.0, field="concentration"):
+    '''!
+      @param windows Sequence of (name, seconds) pairs
+      @param buckets Number of buckets of every window, the window edges are exact to seconds / buckets
+      @param ewma    Time constant of the exponentially weighted moving average, in seconds
+      @param field   Attribute of DFRobot_GasReading the statistics are computed on
+    '''
+    self.windows = collections.OrderedDict((name, DFRobot_RollingWindow(seconds, buckets)) for name, seconds in windows)
+    self.tau = ewma
+    self.field = field
+    self.ewma = None
+    self.latest = None   # Timestamp of the newest reading
+    self.__lock = threading.Lock()
+
+  def add(self, reading):
+    '''!
+      @brief Add a reading
+      @param reading DFRobot_GasReading
+    '''
+    self.add_value(reading.timestamp, getattr(reading, self.field))
+
+  def add_value(self, timestamp, value):
+    '''!
+      @brief Add a sample
+      @param timestamp Time of the sample in seconds
+      @param value     Sample value, NaN is ignored
+    '''
+    if value != value:
+      return
+    with self.__lock:
+      if self.ewma is None:
+        self.ewma = value
+      elif timestamp > self.latest:
+        self.ewma += (value - self.ewma) * (1.0 - math.exp((self.latest - timestamp) / self.tau))
+      if self.latest is None or timestamp > self.latest:
+        self.latest = timestamp
+      for window in self.windows.values():
+        window.add(timestamp, value)
+
+  def stats(self, now=None):
+    '''!
+      @brief Statistics of every window
+      @param now Time the windows end at, None for the timestamp of the newest reading. Pass
+      @n         time.time() to let the windows empty while no reading arrives.
+      @return dict with ewma, latest and, per window name, a dict of count, mean, min, max and twa
+    '''
+    with self.__lock:
+      stats = {"ewma": self.ewma, "latest": self.latest}
+      for name, window in self.windows.items():
+        if now is not None:
+          window.expire(now)
+        stats[name] = window.stats()
+      return stats
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*
+'''
+  @file  bench_hot_paths.py
+  @brief Micro-benchmarks of the host-side per-sample work of the library
+  @n Measures the time per call and the memory allocated per call of the checksum, the frame codec,
+  @n the parsing, appending to a reading history and to rolling statistics, the temperature
+  @n conversion and compensation, read_gas_concentration() against a simulated bus without
+  @n response latency, and of importing the library in a fresh interpreter. The results are
+  @n compared with baseline.json and the script exits with status 1 when a benchmark is slower
+  @n than the baseline by more than the threshold factor, or allocates more.
+  @n python3 bench_hot_paths.py                  Compare with the baseline
+  @n python3 bench_hot_paths.py --save           Store the results as the new baseline
+  @n python3 bench_hot_paths.py -k temp          Only run the benchmarks whose name contains "temp"
+  @n Baselines depend on the machine, store them on the machine the comparisons are run on.
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import json
+import argparse
+import subprocess
+import timeit
+import tracemalloc
+
+LIBRARY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(LIBRARY)
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_codec import encode, encode_set_threshold_alarms, decode, decode_all_data
+from DFRobot_MultiGasSensor_sim import DFRobot_SimulatedI2CBus, DFRobot_SimulatedProbe
+from DFRobot_MultiGasSensor_history import DFRobot_ReadingHistory
+from DFRobot_MultiGasSensor_window import DFRobot_ReadingStatistics
+
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baseline.json")
+
+# Largest tolerated increase of the memory allocated per call, in bytes.
+ALLOC_SLACK = 64
+
+
+def make_sensor(gastype=DFRobot_MultiGasSensor.CO, decimals=1):
+  i2cbus = DFRobot_SimulatedI2CBus()
+  i2cbus.add(0x74, DFRobot_SimulatedProbe(gastype=gastype, concentration=12.3, decimals=decimals, temp=25.0, latency=0))
+  sensor = DFRobot_MultiGasSensor_I2C(0x01, 0x74, transport=i2cbus)
+  sensor.set_turnaround(DFRobot_FixedTurnaround(0))
+  return sensor
+
+def all_data_frame(gastype=DFRobot_MultiGasSensor.CO):
+  frame = bytearray([0xff, CMD_GET_ALL_DTTA, 0x00, 0x7b, gastype, 0x01, 0x02, 0x00, 0])
+  frame[8] = fuc_check_sum(frame, 8)
+  return frame
+
+def benchmarks():
+  '''!
+    @brief The benchmarks to run
+    @return List of (name, function without arguments)
+  '''
+  frame = all_data_frame()
+  sensor = make_sensor()
+  adc_to_temp_ = sensor._DFRobot_MultiGasSensor__adc_to_temp
+  benches = [
+    ("fuc_check_sum",             lambda: fuc_check_sum(frame, 8)),
+    ("is_valid_response",         lambda: is_valid_response(frame, CMD_GET_ALL_DTTA)),
+    ("encode",                    lambda: encode(CMD_GET_TEMP)),
+    ("encode_set_threshold_alarms", lambda: encode_set_threshold_alarms(1, 200)),
+    ("decode_all_data",           lambda: decode_all_data(frame)),
+    ("decode",                    lambda: decode(frame)),
+    ("analysis_all_data",         lambda: sensor.analysis_all_data(frame)),
+    ("adc_to_temp",               lambda: adc_to_temp_(512)),
+    ("adc_to_temp_reference",     lambda: adc_to_temp_reference(512)),
+  ]
+  history = DFRobot_ReadingHistory()
+  def history_append_frame():
+    if len(history) >= 1000000:
+      history.clear()
+    history.append_frame(frame, 0.0)
+  benches.append(("history.append_frame", history_append_frame))
+  statistics = DFRobot_ReadingStatistics()
+  clock = iter(range(1 << 62))
+  benches.append(("statistics.add_value", lambda: statistics.add_value(next(clock) * 0.01, 12.3)))
+  for code in sorted(GAS_TYPE_CODES):
+    gas = make_sensor(gastype=code)
+    gas.analysis_all_data(all_data_frame(code))
+    gas.tempSwitch = gas.ON
+    benches.append(("temp_correction[%s]" % GAS_TYPE_CODES[code],
+                    lambda gas=gas: gas._DFRobot_MultiGasSensor__temp_correction(12.3)))
+  benches.append(("read_gas_concentration", sensor.read_gas_concentration))
+  compensated = make_sensor()
+  compensated.set_temp_compensation(compensated.ON)
+  benches.append(("read_gas_concentration[temp compensation]", compensated.read_gas_concentration))
+  return benches
+
+def time_per_call(fn, min_time):
+  '''!
+    @brief Best time per call of 5 runs, in ns
+  '''
+  timer = timeit.Timer(fn)
+  number, _ = timer.autorange()
+  number = max(number, int(number * min_time / 0.2))
+  return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+def alloc_per_call(fn, calls=100):
+  '''!
+    @brief Largest memory allocated during one call, in bytes
+  '''
+  fn()
+  peak = 0
+  tracemalloc.start()
+  try:
+    for _ in range(calls):
+      tracemalloc.clear_traces()
+      before = tracemalloc.get_traced_memory()[0]
+      tracemalloc.reset_peak()
+      fn()
+      peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+  finally:
+    tracemalloc.stop()
+  return peak
+
+# Imports the library in a fresh interpreter, prints the time taken and the memory allocated.
+_IMPORT_SCRIPT = """
+import sys, time, tracemalloc
+sys.path.insert(0, %r)
+if sys.argv[1] == "alloc":
+  tracemalloc.start()
+start = time.perf_counter()
+import DFRobot_MultiGasSensor
+print(time.perf_counter() - start if sys.argv[1] == "time" else tracemalloc.get_traced_memory()[1])
+"""
+
+def import_cost(runs=10):
+  '''!
+    @brief Best time and memory allocated to import DFRobot_MultiGasSensor, without hardware modules
+    @return (ns, bytes)
+  '''
+  script = _IMPORT_SCRIPT % LIBRARY
+  def run(what):
+    return float(subprocess.check_output([sys.executable, "-c", script, what]))
+  run("time")  # Writes the bytecode cache, if the interpreter may.
+  ns = min(run("time") for _ in range(runs)) * 1e9
+  return ns, int(run("alloc"))
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the host-side hot paths")
+  parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+  parser.add_argument("--baseline", default=BASELINE, help="baseline file (default: %(default)s)")
+  parser.add_argument("--threshold", type=float, default=1.5,
+                      help="tolerated slowdown factor against the baseline (default: %(default)s)")
+  parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run (default: %(default)s)")
+  parser.add_argument("-k", dest="keyword", help="only run the benchmarks whose name contains KEYWORD")
+  args = parser.parse_args()
+
+  baseline = {}
+  if os.path.exists(args.baseline):
+    with open(args.baseline) as f:
+      baseline = json.load(f)["benchmarks"]
+
+  results = {}
+  regressions = []
+  print("%-42s %12s %10s %12s" % ("benchmark", "ns/call", "B/call", "vs baseline"))
+  for name, fn in benchmarks() + [("import DFRobot_MultiGasSensor", None)]:
+    if args.keyword and args.keyword not in name:
+      continue
+    if fn is None:
+      ns, alloc = import_cost()
+    else:
+      ns = time_per_call(fn, args.min_time)
+      alloc = alloc_per_call(fn)
+    results[name] = {"ns": round(ns, 1), "alloc": alloc}
+    compare = ""
+    base = baseline.get(name)
+    if base and not args.save:
+      ratio = ns / base["ns"]
+      compare = "%.2fx" % ratio
+      if ratio > args.threshold:
+        regressions.append("%s: %.0f ns/call, baseline %.0f" % (name, ns, base["ns"]))
+        compare += " SLOWER"
+      if alloc > base["alloc"] + ALLOC_SLACK:
+        regressions.append("%s: %d B/call, baseline %d" % (name, alloc, base["alloc"]))
+        compare += " ALLOC"
+    print("%-42s %12.1f %10d %12s" % (name, ns, alloc, compare))
+
+  if args.save:
+    baseline.update(results)
+    with open(args.baseline, "w") as f:
+      json.dump({"python": sys.version.split()[0], "benchmarks": baseline}, f, indent=2, sort_keys=True)
+      f.write("\n")
+    print("baseline saved to %s" % args.baseline)
+    return 0
+  if regressions:
+    print("\nregressions (threshold %.2fx):" % args.threshold)
+    for regression in regressions:
+      print("  " + regression)
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*
+'''
+  @file  alarm_watcher.py
+  @brief React to the threshold alarm of the sensor as soon as the ALA pin changes, without polling
+  @n Experimental mode: connect sensor communication pin to the main controller and burn, connect BCM pin 18 to pin ALA of the sensor
+  @n Communication mode select, DIP switch SEL: 0: I2C, 1: UART
+  @n The concentration is only read every 10 seconds, an edge of the ALA pin triggers an immediate read.
+  @n Experimental phenomenon: when the data obtained by sensor crosses the set threshold, the reading is printed at once
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import time
+
+#Alarm pin
+pin = 18
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_alarm import DFRobot_AlarmWatcher
+
+'''
+  ctype=1:UART
+  ctype=0:IIC
+'''
+ctype=0
+
+if ctype==0:
+  I2C_1       = 0x01               # I2C_1 Use i2c1 interface (or i2c0 with configuring Raspberry Pi) to drive sensor
+  I2C_ADDRESS = 0x77               # I2C Device address, which can be changed by changing A1 and A0, the default address is 0x77
+  gas = DFRobot_MultiGasSensor_I2C(I2C_1 ,I2C_ADDRESS)
+else:
+  gas = DFRobot_MultiGasSensor_UART(9600)
+
+def on_alarm(event):
+  if event.reading is None:
+    print("alarm %s, read failed" % ("raised" if event.active else "cleared"))
+  else:
+    print("alarm %s: %s %s" % ("raised" if event.active else "cleared",
+                               round(event.reading.concentration,3), event.reading.gasunits))
+
+watcher = DFRobot_AlarmWatcher(on_alarm)
+
+def setup():
+  #Mode of obtaining data: the main controller needs to request the sensor for data
+  while (False == gas.change_acquire_mode(gas.PASSIVITY)):
+    print("wait acquire mode change!")
+    time.sleep(1)
+  print("change acquire mode success!")
+  while (False==gas.set_threshold_alarm(gas.ON,180)):
+    print ("set alarm ERROR!")
+    time.sleep(1)
+  watcher.watch(gas, pin)
+  watcher.start()
+
+def loop():
+  reading = gas.read_all()
+  if reading is not None:
+    print("%s %s" % (round(reading.concentration,3), reading.gasunits))
+  time.sleep(10)
+
+if __name__ == "__main__":
+  setup()
+  try:
+    while True:
+      loop()
+  finally:
+    watcher.stop()
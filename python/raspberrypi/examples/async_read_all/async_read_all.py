@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*
+'''
+  @file  async_read_all.py
+  @brief Read several sensors concurrently from one asyncio event loop
+  @n Experimental mode: connect the sensors to the same I2C bus, each with its own address
+  @n Experimental phenomenon: view the gas concentration of every sensor through serial port printing
+  @n Group serial number         Address in the group
+  A0 A1 DIP level    00    01    10    11
+  @n 1            0x60  0x61  0x62  0x63
+  @n 2            0x64  0x65  0x66  0x67
+  @n 3            0x68  0x69  0x6A  0x6B
+  @n 4            0x6C  0x6D  0x6E  0x6F
+  @n 5            0x70  0x71  0x72  0x73
+  @n 6 (Default address group) 0x74  0x75  0x76  0x77 (Default address)
+  @n 7            0x78  0x79  0x7A  0x7B
+  @n 8            0x7C  0x7D  0x7E  0x7F
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_async import *
+
+I2C_1         = 0x01                          # I2C_1 Use i2c1 interface (or i2c0 with configuring Raspberry Pi) to drive sensor
+I2C_ADDRESSES = [0x74, 0x75, 0x76, 0x77]      # I2C Device addresses of the sensors on the bus
+
+async def watch(addr):
+  gas = AsyncMultiGasSensor(DFRobot_MultiGasSensor_I2C(I2C_1 ,addr))
+  #Mode of obtaining data: the main controller needs to request the sensor for data
+  while (False == await gas.change_acquire_mode(gas.sensor.PASSIVITY)):
+    print("0x%02X: wait acquire mode change!" % addr)
+    await asyncio.sleep(1)
+  await gas.set_temp_compensation(gas.sensor.ON)
+  while True:
+    reading = await gas.read_all()
+    if reading is not None:
+      print("0x%02X: %s %s %s, %s C" % (addr, reading.gastype, round(reading.concentration,3), reading.gasunits, round(reading.temp,3)))
+    await asyncio.sleep(1)
+
+async def main():
+  await asyncio.gather(*[watch(addr) for addr in I2C_ADDRESSES])
+
+if __name__ == "__main__":
+  asyncio.run(main())
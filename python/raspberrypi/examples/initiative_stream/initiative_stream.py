@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*
+'''
+  @file  initiative_stream.py
+  @brief Capture every reading the sensor proactively reports, without polling
+  @n Experimental mode: connect sensor communication pin to the main controller and burn
+  @n Experimental phenomenon: view every reported gas concentration through serial port printing
+  @n Communication mode select, DIP switch SEL: 0: I2C, 1: UART
+  @n On UART a background thread parses each frame as the sensor pushes it. I2C has no push,
+  @n the background thread requests the data once per interval instead.
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from DFRobot_MultiGasSensor import *
+
+'''
+  ctype=1:UART
+  ctype=0:IIC
+'''
+ctype=1
+
+if ctype==0:
+  I2C_1       = 0x01               # I2C_1 Use i2c1 interface (or i2c0 with configuring Raspberry Pi) to drive sensor
+  I2C_ADDRESS = 0x77               # I2C Device address, which can be changed by changing A1 and A0, the default address is 0x77
+  gas = DFRobot_MultiGasSensor_I2C(I2C_1 ,I2C_ADDRESS)
+else:
+  gas = DFRobot_MultiGasSensor_UART(9600)
+
+def setup():
+  #Set the sensor to the mode of proactively reporting data
+  while (False == gas.change_acquire_mode(gas.INITIATIVE)):
+    print("wait acquire mode change!")
+    time.sleep(1)
+  print("change acquire mode success!")
+
+def loop():
+  # Keep the last 64 readings if printing falls behind, older ones are dropped
+  for reading in gas.stream(size=64, policy="drop_oldest"):
+    print("%.3f %s %s %s, %s C" % (reading.timestamp, reading.gastype, round(reading.gasconcentration,3),
+                                   reading.gasunits, round(reading.temp,3)))
+
+if __name__ == "__main__":
+  setup()
+  loop()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*
+'''
+  @file  poll_sensor_fleet.py
+  @brief Read several sensors on the same I2C bus in one pipelined sweep
+  @n Experimental mode: connect the sensors to the same I2C bus, each with its own address
+  @n Experimental phenomenon: view the gas concentration of every sensor through serial port printing
+  @n Group serial number         Address in the group
+  A0 A1 DIP level    00    01    10    11
+  @n 1            0x60  0x61  0x62  0x63
+  @n 2            0x64  0x65  0x66  0x67
+  @n 3            0x68  0x69  0x6A  0x6B
+  @n 4            0x6C  0x6D  0x6E  0x6F
+  @n 5            0x70  0x71  0x72  0x73
+  @n 6 (Default address group) 0x74  0x75  0x76  0x77 (Default address)
+  @n 7            0x78  0x79  0x7A  0x7B
+  @n 8            0x7C  0x7D  0x7E  0x7F
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_fleet import *
+
+I2C_1         = 0x01                          # I2C_1 Use i2c1 interface (or i2c0 with configuring Raspberry Pi) to drive sensor
+I2C_ADDRESSES = [0x74, 0x75, 0x76, 0x77]      # I2C Device addresses of the sensors on the bus
+
+sensors = [DFRobot_MultiGasSensor_I2C(I2C_1 ,addr) for addr in I2C_ADDRESSES]
+fleet = DFRobot_MultiGasSensor_Fleet(sensors)
+
+def setup():
+  #Mode of obtaining data: the main controller needs to request the sensor for data
+  for gas in sensors:
+    while (False == gas.change_acquire_mode(gas.PASSIVITY)):
+      print("wait acquire mode change!")
+      time.sleep(1)
+    gas.set_temp_compensation(gas.ON)
+  print("change acquire mode success!")
+
+def loop():
+  for addr, reading in zip(I2C_ADDRESSES, fleet.read_all()):
+    if reading is None:
+      print("0x%02X: no response" % addr)
+    else:
+      print("0x%02X: %s %s %s, %s C" % (addr, reading.gastype, round(reading.concentration,3), reading.gasunits, round(reading.temp,3)))
+  time.sleep(1)
+
+if __name__ == "__main__":
+  setup()
+  while True:
+    loop()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*
+'''
+  @file  simulated_sensor.py
+  @brief Run the library against simulated probes, without a Raspberry Pi or a sensor
+  @n Experimental phenomenon: print the readings of an I2C and an UART probe and the number of
+  @n transactions per second the I2C bus sustains
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      PengKaixing(kaixing.peng@dfrobot.com)
+  @version     V2.0
+  @date        2021-03-28
+  @url         https://github.com/DFRobot/DFRobot_MultiGasSensor
+'''
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from DFRobot_MultiGasSensor import *
+from DFRobot_MultiGasSensor_sim import *
+
+# A CO probe at the default address answering after 15ms, with noise and 0.1% corrupted responses
+i2cbus = DFRobot_SimulatedI2CBus()
+i2cbus.add(0x74, DFRobot_SimulatedProbe(gastype=DFRobot_MultiGasSensor.CO, concentration=35.0, decimals=1,
+                                        temp=28.0, latency=0.015, noise=0.5, checksum_error_rate=0.001, seed=1))
+gas = DFRobot_MultiGasSensor_I2C(0x01 ,0x74 ,transport=i2cbus)
+
+# An O2 probe on UART
+uart_gas = DFRobot_MultiGasSensor_UART(9600 ,transport=DFRobot_SimulatedSerial(
+  DFRobot_SimulatedProbe(gastype=DFRobot_MultiGasSensor.O2, concentration=20.9, decimals=1, latency=0.02)))
+
+def setup():
+  while (False == gas.change_acquire_mode(gas.PASSIVITY)):
+    print("wait acquire mode change!")
+    time.sleep(1)
+  gas.set_temp_compensation(gas.ON)
+  print("I2C: %s" % gas.read_all())
+  print("UART: %s" % uart_gas.read_all())
+
+def loop():
+  count = 0
+  failed = 0
+  start = time.time()
+  while time.time() - start < 1:
+    if gas.read_all() is None:
+      failed += 1
+    count += 1
+  print("%d transactions/s, %d failed" % (count, failed))
+
+if __name__ == "__main__":
+  setup()
+  while True:
+    loop()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*
+"""
+  @file test_temp_compensation.py
+  @note Edges of the temperature compensation segments, run with python -m pytest tests
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DFRobot_MultiGasSensor import DFRobot_GasType, temp_compensation, temp_compensation_batch
+
+
+class TestTempCompensation(unittest.TestCase):
+  def test_hcl_top_edge_is_exclusive(self):
+    # The C++ library compensates HCL for temp < 50 only.
+    self.assertAlmostEqual(temp_compensation(DFRobot_GasType.HCL, 49.9, 10.0), 10.0 - (-0.01 * 49.9 + 0.1))
+    self.assertEqual(temp_compensation(DFRobot_GasType.HCL, 50, 10.0), 0.0)
+    self.assertEqual(temp_compensation(DFRobot_GasType.HCL, 50.1, 10.0), 0.0)
+
+  def test_closed_top_edge(self):
+    self.assertAlmostEqual(temp_compensation(DFRobot_GasType.CL2, 40, 10.0), 10.0 / 1.1 - (-0.005 * 40 + 0.3))
+
+  def test_lower_edge_is_exclusive(self):
+    self.assertEqual(temp_compensation(DFRobot_GasType.HCL, -20, 10.0), 0.0)
+
+  def test_batch_matches_scalar(self):
+    try:
+      import numpy
+    except ImportError:
+      self.skipTest("NumPy is not installed")
+    temps = [-20, -19.5, 0, 20, 49.9, 50, 50.1]
+    out = temp_compensation_batch([10.0] * len(temps), temps, [DFRobot_GasType.HCL] * len(temps))
+    for temp, value in zip(temps, out):
+      self.assertAlmostEqual(value, temp_compensation(DFRobot_GasType.HCL, temp, 10.0))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*
+"""
+  @file test_temp_table.py
+  @note Lookup table of the onboard temperature against the thermistor equation, run with python -m pytest tests
+  @copyright   Copyright (c) 2010 DFRobot Co.Ltd (http://www.dfrobot.com)
+  @license     The MIT License (MIT)
+  @author      [PengKaixing](kaixing.peng@dfrobot.com)
+  @version  V2.0
+  @date  2021-03-31
+  @url https://github.com/DFRobot/DFRobot_MultiGasSensor
+"""
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DFRobot_MultiGasSensor import TEMP_TABLE, adc_to_temp, adc_to_temp_reference
+
+
+class TestTempTable(unittest.TestCase):
+  def test_table_matches_reference(self):
+    self.assertEqual(len(TEMP_TABLE), 1024)
+    for adc in range(1, 1024):
+      self.assertEqual(TEMP_TABLE[adc], adc_to_temp_reference(adc), "ADC value %d" % adc)
+      self.assertEqual(adc_to_temp(adc), adc_to_temp_reference(adc), "ADC value %d" % adc)
+
+  def test_undefined_readings_are_nan(self):
+    for adc in (0, 1024, -1):
+      self.assertTrue(math.isnan(adc_to_temp(adc)), "ADC value %d" % adc)
+
+
+if __name__ == "__main__":
+  unittest.main()